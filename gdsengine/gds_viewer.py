@@ -1,13 +1,43 @@
 import streamlit as st
 import os
 import json
+import gzip
+import base64
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
 import xml.etree.ElementTree as ET
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import numpy as np
 import streamlit.components.v1 as components
+from streamlit import runtime
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional: stdlib ElementTree parses .lyp files too
+    lxml_etree = None
+
+try:
+    import mapbox_earcut
+except ImportError:  # optional: dense cells then stay on the Canvas2D path
+    mapbox_earcut = None
+
+try:
+    import zstandard
+except ImportError:  # optional: disk-cache entries are then stored as plain JSON
+    zstandard = None
 
 # KLayout-style layer defaults: (fill_color, frame_color, stipple_index)
 # Stipple indices reference built-in KLayout patterns defined in JS.
-_LAYER_STYLES = [
+_STYLE_DTYPE = [("fill", "U9"), ("frame", "U9"), ("stipple", "i4")]
+_LAYER_STYLES = np.array([
     ("#ff0000", "#ff0000",  2),   # dotted
     ("#00ff00", "#00ff00",  4),   # left-hatched
     ("#0000ff", "#0000ff",  5),   # lightly left-hatched
@@ -24,7 +54,53 @@ _LAYER_STYLES = [
     ("#80ffff", "#80ffff", 38),   # horizontal
     ("#ffff80", "#ffff80", 28),   # zig zag
     ("#ff80ff", "#ff80ff", 29),   # sine
-]
+], dtype=_STYLE_DTYPE)
+
+# Parsed .lyp rows, sorted by layer number (one row per layer).
+_LYP_DTYPE = [("layer", "i4"), ("fill", "O"), ("frame", "O"), ("name", "O")]
+
+# Level-of-detail pyramid: simplification tolerances in "fit-view pixels"
+# (cell extent / _LOD_FIT_PX). Only polygons with more vertices than
+# _LOD_MIN_VERTS are simplified; rectangles and the like never shrink.
+_LOD_EPS_PX    = (1, 4, 16)
+_LOD_FIT_PX    = 1024
+_LOD_MIN_VERTS = 8
+
+# "Detail level" choices: the largest simplification error (screen pixels)
+# the renderer accepts when picking a level from the pyramid above.
+_DETAIL_LEVELS = {"Full": 0, "High": 1, "Balanced": 4, "Fast": 16}
+
+# Builds of more flattened polygons than this fan out to a process pool,
+# smaller ones to a thread pool. Starting the pool costs about 0.7 s (each
+# worker re-imports this module and re-reads the GDS), which a build only
+# wins back at some tens of thousands of polygons per spare core.
+_PARALLEL_MIN_POLYS = 200_000
+
+# Vertices are shipped as integers on this grid (world units), relative to
+# the cell's view-box corner: int16 when the cell is small enough, else int32.
+# Cells too big for int32 at this step get a coarser one (see _quantum).
+_QUANTUM = 0.01
+
+# Spatial index: a uniform grid per layer with about _GRID_PER_BIN
+# polygons per bin, and at most _GRID_MAX bins per axis.
+_GRID_PER_BIN = 16
+_GRID_MAX     = 1024
+
+# Cells with more polygons than this are triangulated for the WebGL2 path;
+# below it one Canvas2D fill() per polygon is cheap enough.
+_WEBGL_MIN_POLYS = 20000
+
+# A layer's coords are shipped as a pool of distinct shapes plus per-polygon
+# (shape, offset) instances when that is at most this fraction of the size.
+_POOL_MAX_RATIO = 0.5
+
+# Built payloads are kept on disk across sessions, keyed by the content of
+# the upload; least recently used entries go beyond _DISK_CACHE_MAX bytes.
+# Entries are plain JSON, so a shared cache directory holds no code.
+# Bump _DISK_CACHE_VERSION whenever the payload format changes.
+_DISK_CACHE_DIR     = os.path.join(os.path.expanduser("~"), ".cache", "luxweb", "gds")
+_DISK_CACHE_MAX     = 500 << 20
+_DISK_CACHE_VERSION = 8
 
 
 def _unit_label(lib_unit):
@@ -34,97 +110,658 @@ def _unit_label(lib_unit):
     return "u"
 
 
-def _parse_lyp(lyp_bytes):
-    """Parse a KLayout .lyp file.
-    Returns ({layer: hex_color}, {layer: frame_color}, {layer: name})."""
-    layer_fills  = {}
-    layer_frames = {}
-    layer_names  = {}
+def _dumps(obj):
+    """Compact JSON text; uses orjson (which also takes ndarrays) if present."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, separators=(',',':'))
+
+
+def _media_url(data, mimetype, key):
+    """Serve ``data`` from Streamlit's media endpoint and return its URL.
+    Returns None outside a Streamlit runtime."""
+    if not runtime.exists():
+        return None
+    url  = runtime.get_instance().media_file_mgr.add(
+        data, mimetype, f"gds_viewer.{key}")
+    base = st.get_option("server.baseUrlPath").strip("/")
+    return f"/{base}{url}" if base else url
+
+
+def _parse_lyp(stream):
+    """Parse a KLayout .lyp file from a binary file-like object.
+    Returns a _LYP_DTYPE array sorted by layer; the last entry for a layer
+    wins, as in KLayout, except that an empty name keeps an earlier one."""
+    rows = []
+    # Stream <properties> elements and free each one once read; lxml is
+    # faster, ElementTree's iterparse does the same job without it.
+    if lxml_etree is not None:
+        props_iter = lxml_etree.iterparse(stream, tag="properties",
+                                          resolve_entities=False,
+                                          no_network=True)
+        parse_errors = (lxml_etree.XMLSyntaxError,)
+    else:
+        props_iter = ((ev, el) for ev, el in ET.iterparse(stream)
+                      if el.tag == "properties")
+        parse_errors = (ET.ParseError,)
     try:
-        root = ET.fromstring(lyp_bytes)
-        for props in root.findall(".//properties"):
-            if props.findtext("visible", "true").strip().lower() == "false":
-                continue
+        for _, props in props_iter:
+            visible     = props.findtext("visible",     "true").strip()
             source      = props.findtext("source",      "").strip()
             fill_color  = props.findtext("fill-color",  "").strip()
             frame_color = props.findtext("frame-color", "").strip()
             name        = props.findtext("name",        "").strip()
-            if not source or not fill_color:
+            props.clear()
+            if lxml_etree is not None:   # drop the emptied siblings too
+                while props.getprevious() is not None:
+                    del props.getparent()[0]
+            if visible.lower() == "false" or not source or not fill_color:
                 continue
             try:
                 layer = int(source.split("/")[0])
-                layer_fills[layer]  = fill_color
-                layer_frames[layer] = frame_color or fill_color
-                if name:
-                    layer_names[layer] = name
+                rows.append((layer, fill_color, frame_color or fill_color, name))
             except (ValueError, IndexError):
                 continue
-    except ET.ParseError:
+    except parse_errors:
         pass
-    return layer_fills, layer_frames, layer_names
-
-
-def _build_cell_data(cell, layer_fills=None, layer_frames=None, layer_names=None):
+    table = np.array(rows, dtype=_LYP_DTYPE)
+    # np.unique on the reversed column picks each layer's last row.
+    _, last = np.unique(table["layer"][::-1], return_index=True)
+    out   = table[len(table) - 1 - last]
+    named = table[table["name"] != ""]
+    layers, last = np.unique(named["layer"][::-1], return_index=True)
+    out["name"] = ""
+    out["name"][np.isin(out["layer"], layers)] = named["name"][len(named) - 1 - last]
+    return out
+
+
+def _quantum(vb_w, vb_h):
+    """Grid step of a cell's quantized vertices: _QUANTUM, or the finest
+    step that still keeps the cell's extent within int32."""
+    return max(_QUANTUM, max(vb_w, vb_h) / (np.iinfo(np.int32).max - 1))
+
+
+def _coord_dtype(vb_w, vb_h):
+    """Typed-array dtype of a cell's quantized vertices."""
+    steps = max(vb_w, vb_h) / _quantum(vb_w, vb_h)
+    return "<i2" if steps <= np.iinfo(np.int16).max else "<i4"
+
+
+def _b64(arr, dtype):
+    """Base64 of ``arr`` as little-endian ``dtype`` (a JS typed array)."""
+    return base64.b64encode(
+        np.ascontiguousarray(arr, dtype=dtype).tobytes()).decode("ascii")
+
+
+def _simplify_ring(pts, eps):
+    """Douglas-Peucker simplification of a closed ring of (N, 2) points.
+    Returns ``pts`` itself when nothing can go or under 3 vertices would stay."""
+    n = len(pts)
+    if n <= 3:
+        return pts
+    # Split the ring at the vertex farthest from vertex 0 and simplify the
+    # two open chains; ring[n] closes the loop back to vertex 0.
+    far  = int(np.argmax(((pts - pts[0]) ** 2).sum(axis=1)))
+    ring = np.vstack((pts, pts[:1]))
+    keep = np.zeros(n + 1, dtype=bool)
+    keep[[0, far, n]] = True
+    stack = [(0, far), (far, n)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        a, d = ring[i], ring[j] - ring[i]
+        seg  = ring[i + 1:j] - a
+        norm = np.hypot(d[0], d[1])
+        if norm:
+            dist = np.abs(d[0] * seg[:, 1] - d[1] * seg[:, 0]) / norm
+        else:
+            dist = np.hypot(seg[:, 0], seg[:, 1])
+        k = int(np.argmax(dist))
+        if dist[k] > eps:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    keep = keep[:n]
+    if keep.all() or keep.sum() < 3:
+        return pts
+    return pts[keep]
+
+
+def _triangulate(coords, offsets):
+    """Triangle indices into ``coords`` for the polygons of one layer.
+    Convex polygons are fanned in bulk; only the rest go through earcut."""
+    verts  = np.asarray(coords, dtype=np.float32).reshape(-1, 2)
+    starts = np.asarray(offsets[:-1]) // 2
+    counts = np.diff(offsets) // 2
+    parts  = []
+    for n in np.unique(counts).tolist():
+        first = starts[counts == n]
+        idx   = first[:, None] + np.arange(n)
+        edge  = np.roll(verts[idx], -1, axis=1) - verts[idx]
+        nxt   = np.roll(edge, -1, axis=1)
+        cross = edge[..., 0] * nxt[..., 1] - edge[..., 1] * nxt[..., 0]
+        convex = (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+        fan = np.column_stack((np.zeros(n - 2, dtype=int),
+                               np.arange(1, n - 1), np.arange(2, n)))
+        parts.append(idx[convex][:, fan.ravel()].ravel())
+        ring = np.array([n], dtype=np.uint32)
+        for s in first[~convex].tolist():
+            parts.append(
+                mapbox_earcut.triangulate_float32(verts[s:s + n], ring) + s)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+
+
+def _orient(pts, starts, counts):
+    """Give every polygon the same winding (positive shoelace area), so a
+    nonzero fill of a whole layer does not cancel out overlaps."""
+    poly = np.repeat(np.arange(len(counts)), counts)
+    i    = np.arange(len(pts))
+    nxt  = i + 1
+    nxt[starts + counts - 1] = starts
+    area = np.add.reduceat(pts[:, 0] * pts[nxt, 1] - pts[nxt, 0] * pts[:, 1],
+                           starts)
+    flip = (area < 0)[poly]
+    if not flip.any():
+        return pts
+    rev = 2 * starts[poly] + counts[poly] - 1 - i
+    return pts[np.where(flip, rev, i)]
+
+
+def _pool_shapes(coords, starts, counts, ctype):
+    """Deduplicate a layer's quantized polygons up to translation.
+    Returns [pool, pool_offsets, shape_ids, deltas] as base64 strings, or None
+    when that would not shrink ``coords`` by _POOL_MAX_RATIO."""
+    q    = coords.reshape(-1, 2).astype(np.int64)
+    mins = np.minimum.reduceat(q, starts)
+    norm = q - np.repeat(mins, counts, axis=0)
+    sid  = np.empty(len(counts), dtype=np.int64)
+    pool, sizes, n_shapes = [], [], 0
+    rng = np.random.default_rng(0)
+    # Only polygons with equal vertex counts can match: unique per count.
+    for c in np.unique(counts):
+        which = np.flatnonzero(counts == c)
+        rows  = norm[starts[which, None] + np.arange(c)].reshape(len(which), -1)
+        # Sorting one 64-bit hash per row beats a row-wise unique; the
+        # comparison below catches collisions.
+        h = rows @ rng.integers(1, 2**62, rows.shape[1])
+        _, first, inv = np.unique(h, return_index=True, return_inverse=True)
+        uniq = rows[first]
+        if not np.array_equal(uniq[inv], rows):
+            uniq, inv = np.unique(rows, axis=0, return_inverse=True)
+        sid[which] = n_shapes + inv.ravel()
+        n_shapes  += len(uniq)
+        pool.append(uniq.ravel())
+        sizes.append(np.full(len(uniq), 2 * c))
+    pool = np.concatenate(pool)
+    if len(pool) + 3 * len(counts) > _POOL_MAX_RATIO * len(coords):
+        return None
+    return [_b64(pool, ctype),
+            _b64(np.concatenate(([0], np.cumsum(np.concatenate(sizes)))), "<u4"),
+            _b64(sid, "<u4"), _b64(mins.ravel(), ctype)]
+
+
+def _grid_index(bounds):
+    """Uniform-grid index over one layer's (N, 4) polygon bounds.
+    Returns [x0, y0, size, nx, ny, start, idx, big]: bin ``b`` holds
+    ``idx[start[b]:start[b+1]]``, ``big`` the polygons wider than a bin."""
+    x0, y0 = bounds[:, :2].min(axis=0)
+    x1, y1 = bounds[:, 2:].max(axis=0)
+    ext  = max(x1 - x0, y1 - y0, 1e-9)
+    size = max(np.sqrt((x1 - x0) * (y1 - y0) * _GRID_PER_BIN / len(bounds)),
+               ext / _GRID_MAX)
+    nx = max(int(np.ceil((x1 - x0) / size)), 1)
+    ny = max(int(np.ceil((y1 - y0) / size)), 1)
+
+    big   = ((bounds[:, 2] - bounds[:, 0] > size) |
+             (bounds[:, 3] - bounds[:, 1] > size))
+    small = np.flatnonzero(~big)
+    gx = np.minimum((bounds[small, 0] + bounds[small, 2]) / 2 - x0, ext) // size
+    gy = np.minimum((bounds[small, 1] + bounds[small, 3]) / 2 - y0, ext) // size
+    key = (np.minimum(gy, ny - 1) * nx + np.minimum(gx, nx - 1)).astype(np.int64)
+    start = np.concatenate(([0], np.cumsum(np.bincount(key, minlength=nx * ny))))
+    idx   = small[np.argsort(key, kind="stable")]
+    return [float(x0), float(y0), float(size), nx, ny,
+            _b64(start, "<u4"), _b64(idx, "<u4"), _b64(np.flatnonzero(big), "<u4")]
+
+
+def _build_cell_data(cell, lyp=None, keep_subpx=False):
     """Build canvas render data for one gdstk Cell.
 
     Returns (layers_list, vb_x, vb_y, vb_w, vb_h) or (None, 0,0,1,1).
 
     Each entry:
-        [layer_num, name, fill_color, frame_color, stipple_idx, polys, bounds]
+        [layer_num, name, fill_color, frame_color, stipple_idx,
+         coords, offsets, bounds, lods, tris, grid]
     """
-    layer_polys = defaultdict(list)
-    all_x, all_y = [], []
-
-    for poly in cell.get_polygons():
-        pts = poly.points
-        if len(pts) < 3:
-            continue
-        xs = pts[:, 0]
-        ys = -pts[:, 1]
-        all_x.extend(xs.tolist())
-        all_y.extend(ys.tolist())
-
-        flat = []
-        for x, y in zip(xs.tolist(), ys.tolist()):
-            flat.append(round(x, 2))
-            flat.append(round(y, 2))
-
-        bx0, bx1 = float(xs.min()), float(xs.max())
-        by0, by1 = float(ys.min()), float(ys.max())
-        layer_polys[poly.layer].append((flat, bx0, by0, bx1, by1))
-
-    if not all_x:
+    polys  = cell.get_polygons(depth=None, include_paths=True)
+    pts    = [poly.points for poly in polys]   # each access copies the vertices out of gdstk
+    layers = np.fromiter((poly.layer for poly in polys), dtype=np.int64, count=len(polys))
+    npts   = np.fromiter(map(len, pts), dtype=np.int64, count=len(pts))
+
+    # Bucket polygon indices by layer with one stable sort (file order is
+    # kept within a layer) instead of a dict append per polygon.
+    order = np.flatnonzero(npts >= 3)
+    if not len(order):
         return None, 0, 0, 1, 1
-
-    mn_x, mx_x = min(all_x), max(all_x)
-    mn_y, mx_y = min(all_y), max(all_y)
+    order = order[np.argsort(layers[order], kind="stable")]
+    layer_ids, firsts = np.unique(layers[order], return_index=True)
+    splits = np.append(firsts, len(order))
+
+    # One (N, 2) vertex array per layer, y flipped to screen orientation;
+    # polygon i spans pts[starts[i]:starts[i] + counts[i]].
+    layer_geom = {}
+    for i, layer in enumerate(layer_ids.tolist()):
+        idx    = order[splits[i]:splits[i + 1]]
+        counts = npts[idx]
+        starts = np.concatenate(([0], np.cumsum(counts[:-1])))
+        flat   = np.concatenate([pts[j] for j in idx.tolist()])
+        layer_geom[layer] = (_orient(flat * (1, -1), starts, counts),
+                             starts, counts)
+
+    mn_x, mn_y = np.min([g[0].min(axis=0) for g in layer_geom.values()], axis=0)
+    mx_x, mx_y = np.max([g[0].max(axis=0) for g in layer_geom.values()], axis=0)
     pad  = max(mx_x - mn_x, mx_y - mn_y) * 0.02 or 1
     vb_x = float(mn_x - pad)
     vb_y = float(mn_y - pad)
     vb_w = float(mx_x - mn_x + 2 * pad)
     vb_h = float(mx_y - mn_y + 2 * pad)
+    fit_px = max(vb_w, vb_h) / _LOD_FIT_PX
+    origin = (vb_x, vb_y)
+    ctype  = _coord_dtype(vb_w, vb_h)
+    quant  = _quantum(vb_w, vb_h)
+    use_gl = (mapbox_earcut is not None and
+              len(order) > _WEBGL_MIN_POLYS)
+
+    # Resolve every layer's style in one vectorized pass: defaults cycle
+    # through _LAYER_STYLES, .lyp rows override them by layer number.
+    layer_nums = sorted(layer_geom)
+    nums   = np.array(layer_nums, dtype=np.int32)
+    styles = _LAYER_STYLES[np.arange(len(nums)) % len(_LAYER_STYLES)]
+    fills, frames = styles["fill"], styles["frame"]
+    names  = np.array([f"{n}/0" for n in layer_nums], dtype=object)
+    if lyp is not None and len(lyp):
+        pos = np.minimum(np.searchsorted(lyp["layer"], nums), len(lyp) - 1)
+        row = lyp[pos]
+        hit = row["layer"] == nums
+        fills  = np.where(hit, row["fill"],  fills)
+        frames = np.where(hit, row["frame"], frames)
+        names  = np.where(hit & (row["name"] != ""), row["name"], names)
 
     layers_list = []
-    for i, layer_num in enumerate(sorted(layer_polys)):
-        style      = _LAYER_STYLES[i % len(_LAYER_STYLES)]
-        fill_c     = (layer_fills  or {}).get(layer_num, style[0])
-        frame_c    = (layer_frames or {}).get(layer_num, style[1])
-        stip_idx   = style[2]
-        lname      = (layer_names  or {}).get(layer_num, f"{layer_num}/0")
-
-        polys  = []
-        bounds = []
-        for (flat, bx0, by0, bx1, by1) in layer_polys[layer_num]:
-            polys.append(flat)
-            bounds.append([round(bx0,2), round(by0,2),
-                           round(bx1,2), round(by1,2)])
-
-        layers_list.append([layer_num, lname, fill_c,
-                            frame_c, stip_idx, polys, bounds])
+    for i, layer_num in enumerate(layer_nums):
+        fill_c     = str(fills[i])
+        frame_c    = str(frames[i])
+        stip_idx   = int(styles["stipple"][i])
+        lname      = str(names[i])
+
+        pts, starts, counts = layer_geom[layer_num]
+        coords  = np.round((pts - origin) / quant).ravel()
+        offsets = np.concatenate(([0], np.cumsum(counts) * 2))
+        bounds  = np.round(np.hstack((np.minimum.reduceat(pts, starts),
+                                      np.maximum.reduceat(pts, starts))),
+                           2).ravel()
+
+        # Each level simplifies the previous one, so the pyramid costs
+        # little more than its first level. Unless keep_subpx is set, a
+        # level also empties the polygons under 1 / max_px of its eps: the
+        # renderer picks it at most max_px / eps screen pixels per unit (the
+        # "Fast" setting), so those stay under a pixel and are drawn as dots
+        # whatever the detail level.
+        lods   = []
+        rings  = {j: pts[starts[j]:starts[j] + counts[j]]
+                  for j in np.flatnonzero(counts > _LOD_MIN_VERTS).tolist()}
+        simple_q = {}                     # ring j, quantized, once reduced
+        lens   = counts * 2               # coords per polygon at this level
+        b4     = bounds.reshape(-1, 4)
+        size   = np.maximum(b4[:, 2] - b4[:, 0], b4[:, 3] - b4[:, 1])
+        max_px = max(_DETAIL_LEVELS.values())
+        for eps_px in _LOD_EPS_PX:
+            eps     = eps_px * fit_px
+            reduced = False
+            if not keep_subpx:
+                tiny = (size < eps / max_px) & (lens > 0)
+                if tiny.any():
+                    lens    = np.where(tiny, 0, lens)
+                    reduced = True
+                    for j in np.flatnonzero(tiny).tolist():
+                        rings.pop(j, None)
+                        simple_q.pop(j, None)
+            for j, ring in rings.items():
+                simple = _simplify_ring(ring, eps)
+                if len(simple) < len(ring):
+                    rings[j]    = simple
+                    simple_q[j] = np.round((simple - origin) / quant).ravel()
+                    lens[j]     = len(simple_q[j])
+                    reduced     = True
+            if not reduced:
+                continue
+            # Untouched polygons are copied over in one go, the rest slot in.
+            lod_off = np.concatenate(([0], np.cumsum(lens)))
+            lod_c   = np.empty(lod_off[-1])
+            src     = np.flatnonzero(np.repeat(lens == counts * 2, counts * 2))
+            delta   = np.repeat(lod_off[:-1] - offsets[:-1], counts * 2)
+            lod_c[src + delta[src]] = coords[src]
+            for j, q in simple_q.items():
+                lod_c[lod_off[j]:lod_off[j + 1]] = q
+            lods.append([round(eps, 4), _b64(lod_c, ctype), _b64(lod_off, "<u4")])
+
+        tris = _triangulate(coords, offsets) if use_gl else ()
+
+        pooled = _pool_shapes(coords, starts, counts, ctype)
+        layers_list.append([layer_num, lname, fill_c, frame_c, stip_idx,
+                            pooled or _b64(coords, ctype), _b64(offsets, "<u4"),
+                            _b64(bounds, "<f4"), lods, _b64(tris, "<u4"),
+                            _grid_index(bounds.reshape(-1, 4))])
 
     return layers_list, vb_x, vb_y, vb_w, vb_h
 
 
+def _cell_signature(cell, memo):
+    """Hash of everything _build_cell_data draws for ``cell``.
+    ``memo`` maps cell names to signatures."""
+    sig = memo.get(cell.name)
+    if sig is not None:
+        return sig
+    h = hashlib.blake2b(digest_size=16)
+    polys = list(cell.polygons)
+    for path in cell.paths:
+        polys.extend(path.to_polygons())
+    for poly in polys:
+        h.update(b"p%d,%d;" % (poly.layer, len(poly.points)))
+        h.update(poly.points.tobytes())
+    for ref in cell.references:
+        target = ref.cell
+        if hasattr(target, "references"):
+            h.update(b"r" + _cell_signature(target, memo))
+        else:   # unresolved reference: only the name is known
+            h.update(b"n" + str(ref.cell_name).encode())
+        h.update(np.array([*ref.origin, ref.rotation, ref.magnification,
+                           ref.x_reflection], dtype=np.float64).tobytes())
+        h.update(ref.repetition.get_offsets().tobytes())
+    sig = memo[cell.name] = h.digest()
+    return sig
+
+
+def _flat_polygon_count(cell, memo):
+    """Number of polygons get_polygons returns for ``cell``, counted
+    without flattening (a path counts as one). ``memo`` maps cell names
+    to counts."""
+    n = memo.get(cell.name)
+    if n is not None:
+        return n
+    n = len(cell.polygons) + len(cell.paths)
+    for ref in cell.references:
+        if hasattr(ref.cell, "references"):
+            n += max(ref.repetition.size, 1) * _flat_polygon_count(ref.cell, memo)
+    memo[cell.name] = n
+    return n
+
+
+_WORKER_CELLS: dict = {}
+
+
+def _init_cell_worker(gds_path):
+    """Process-pool initializer: read the library once per worker."""
+    import gdstk
+    _WORKER_CELLS.update((c.name, c) for c in gdstk.read_gds(gds_path).cells)
+
+
+def _build_cell_worker(name, lyp=None, keep_subpx=False):
+    return _build_cell_data(_WORKER_CELLS[name], lyp, keep_subpx)
+
+
+def _spool_upload(upload):
+    """Copy a GDS upload to a temp file and return its path.
+    gdstk.read_gds only takes a path; the caller removes the file."""
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".gds", delete=False) as f:
+        shutil.copyfileobj(upload, f, length=1 << 20)
+        return f.name
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _read_library(gds_hash, _upload):
+    """Parse a GDS upload with gdstk, once per ``gds_hash``.
+    The Library is shared, not copied: callers must not modify it."""
+    import gdstk
+    gds_path = _spool_upload(_upload)
+    try:
+        return gdstk.read_gds(gds_path)
+    finally:
+        os.remove(gds_path)
+
+
+def _build_cells(upload, cells, lyp=None, keep_subpx=False):
+    """Run _build_cell_data over ``cells``, in order: in one process per
+    core for big builds (see _PARALLEL_MIN_POLYS), in threads otherwise."""
+    workers = min(os.cpu_count() or 1, len(cells)) or 1
+    memo    = {}
+    if (workers < 2 or sum(_flat_polygon_count(c, memo) for c in cells)
+            < _PARALLEL_MIN_POLYS):
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(partial(_build_cell_data, lyp=lyp,
+                                       keep_subpx=keep_subpx), cells))
+    # "spawn": forking the threaded Streamlit server is not safe.
+    gds_path = _spool_upload(upload)
+    try:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_cell_worker, initargs=(gds_path,)) as ex:
+            return list(ex.map(partial(_build_cell_worker, lyp=lyp,
+                                       keep_subpx=keep_subpx),
+                               [c.name for c in cells]))
+    finally:
+        os.remove(gds_path)
+
+
+def _disk_cache_path(key):
+    suffix = ".json.zst" if zstandard is not None else ".json"
+    return os.path.join(_DISK_CACHE_DIR, key + suffix)
+
+
+def _disk_cache_get(key):
+    """Return the payload stored under ``key``, or None on a miss."""
+    path = _disk_cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if zstandard is not None:
+            data = zstandard.ZstdDecompressor().decompress(data)
+        cells, *rest = json.loads(data)
+        cells_gz = {name: base64.b64decode(gz) if isinstance(gz, str) else gz
+                    for name, gz in cells.items()}
+        os.utime(path)   # mark as recently used
+        return (cells_gz, *rest)
+    except Exception:   # missing, unreadable or stale: rebuild
+        return None
+
+
+def _disk_cache_put(key, payload):
+    """Store ``payload`` under ``key``, then trim the cache to size."""
+    cells_gz, *rest = payload
+    cells = {name: base64.b64encode(gz).decode("ascii")
+                   if isinstance(gz, bytes) else gz
+             for name, gz in cells_gz.items()}
+    data = _dumps([cells, *rest]).encode()
+    if zstandard is not None:
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    try:
+        os.makedirs(_DISK_CACHE_DIR, exist_ok=True)
+        tmp = os.path.join(_DISK_CACHE_DIR, f".{key}.{os.getpid()}")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, _disk_cache_path(key))
+
+        entries = []
+        for e in os.scandir(_DISK_CACHE_DIR):
+            if e.is_file() and not e.name.startswith("."):
+                info = e.stat()
+                entries.append((info.st_mtime, info.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= _DISK_CACHE_MAX:
+                break
+            os.remove(path)
+            total -= size
+    except OSError:
+        pass   # the cache is best effort
+
+
+def _upload_key(upload, lyp_upload, keep_subpx):
+    """Disk-cache key prefix: hashes of the GDS content and of the options."""
+    gds_hash  = hashlib.blake2b(digest_size=16)
+    opts_hash = hashlib.blake2b(
+        _dumps([_DISK_CACHE_VERSION, keep_subpx]).encode(), digest_size=8)
+    for h, f in ((gds_hash, upload), (opts_hash, lyp_upload)):
+        if f is not None:
+            f.seek(0)
+            for chunk in iter(partial(f.read, 1 << 20), b""):
+                h.update(chunk)
+    return gds_hash.hexdigest(), opts_hash.hexdigest()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _prepare_payload(file_id, _upload, lyp_id=None, _lyp=None,
+                     keep_subpx=False):
+    """Read a GDS upload and build the viewer's payload, cached by file_id.
+    Returns (cells_gz, top_names_json, cell_tree_json, init_cell, unit,
+    deferred); raises ValueError when the file has nothing to show."""
+    gds_key, opts_key = _upload_key(_upload, _lyp, keep_subpx)
+    key = f"{gds_key}-{opts_key}"
+
+    payload = _disk_cache_get(key)
+    if payload is None:
+        lib     = _read_library(gds_key, _upload)
+        payload = _build_payload(lib, _upload, _lyp, keep_subpx)
+        _disk_cache_put(key, payload)
+    return payload
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _prepare_subcell(file_id, _upload, lyp_id, _lyp, name, keep_subpx=False):
+    """Gzipped JSON of sub-cell ``name``, or None if it has no geometry.
+    Cached apart from _prepare_payload, so the top cells are not rebuilt."""
+    gds_key, opts_key = _upload_key(_upload, _lyp, keep_subpx)
+    name_key = hashlib.blake2b(name.encode(), digest_size=8).hexdigest()
+    key = f"{gds_key}-{opts_key}-{name_key}"
+
+    hit = _disk_cache_get(key)
+    if hit is not None:
+        return hit[0].get(name)
+    lib = _read_library(gds_key, _upload)
+    cd  = _cell_entry(*_build_cells(_upload, [lib[name]], _load_lyp(_lyp),
+                                    keep_subpx)[0])
+    gz  = _gzip_cell(cd) if cd is not None else None
+    _disk_cache_put(key, ({name: gz} if gz is not None else {},))
+    return gz
+
+
+def _load_lyp(lyp_upload):
+    if lyp_upload is None:
+        return None
+    lyp_upload.seek(0)
+    return _parse_lyp(lyp_upload)
+
+
+def _cell_entry(layers_list, vb_x, vb_y, vb_w, vb_h):
+    """The viewer's dict for one _build_cell_data result, or None if empty."""
+    if layers_list is None:
+        return None
+    return {
+        "b": [vb_x, vb_y, vb_w, vb_h],
+        "q": [_quantum(vb_w, vb_h),
+              16 if _coord_dtype(vb_w, vb_h) == "<i2" else 32],
+        "l": layers_list,
+    }
+
+
+def _gzip_cell(cd):
+    # Level 1 gets most of gzip's ratio on the base64 geometry (about 3.5x)
+    # in a fraction of the time of the default level.
+    return gzip.compress(_dumps(cd).encode(), compresslevel=1)
+
+
+def _build_payload(lib, upload, lyp_upload, keep_subpx):
+    """Build _prepare_payload's result from the parsed ``lib``."""
+    top_cells = lib.top_level()
+    if not top_cells:
+        raise ValueError("No top-level cell found in GDS file.")
+
+    lyp = _load_lyp(lyp_upload)
+
+    top_names = [c.name for c in top_cells]
+    try:
+        all_lib_cells = list(lib.cells)
+    except Exception:
+        all_lib_cells = list(top_cells)
+
+    non_top = sorted(
+        [c for c in all_lib_cells if c.name not in top_names],
+        key=lambda c: c.name)
+    ordered_cells = list(top_cells) + non_top
+
+    cell_children: dict = {}
+    for cell in ordered_cells:
+        children = []
+        for ref in getattr(cell, "references", []):
+            try:
+                cname = ref.cell.name if ref.cell else ref.cell_name
+                if cname not in children:
+                    children.append(cname)
+            except Exception:
+                pass
+        cell_children[cell.name] = children
+
+    # Sub-cells are already drawn (flattened) inside their top cells,
+    # so only build them when the user asks for them.
+    seen = set()
+    for top in top_cells:
+        seen.update(c.name for c in top.dependencies(True))
+    deferred = [c.name for c in non_top if c.name in seen]
+
+    to_build = [c for c in ordered_cells if c.name not in seen]
+
+    # Cells with the same geometry (replicas, fillers) are built once;
+    # the others become aliases of the first.
+    sigs, masters = {}, {}
+    alias = {}
+    for c in to_build:
+        master = masters.setdefault(_cell_signature(c, sigs), c)
+        if master is not c:
+            alias[c.name] = master.name
+    unique = [c for c in to_build if c.name not in alias]
+    built_data = dict(zip(
+        (c.name for c in unique),
+        _build_cells(upload, unique, lyp, keep_subpx)))
+
+    all_cells_data: dict = {}
+    for cell in ordered_cells:
+        if cell.name in alias:
+            if alias[cell.name] in all_cells_data:
+                all_cells_data[cell.name] = {"alias": alias[cell.name]}
+            continue
+        if cell.name not in built_data:
+            all_cells_data[cell.name] = {"lazy": True}
+            continue
+        cd = _cell_entry(*built_data[cell.name])
+        if cd is not None:
+            all_cells_data[cell.name] = cd
+
+    built = [n for n, cd in all_cells_data.items() if "l" in cd]
+    if not built:
+        raise ValueError("No geometry found in GDS file.")
+
+    init_cell = next((n for n in top_names if n in built), built[0])
+
+    cells_gz = {name: _gzip_cell(cd) if "l" in cd else cd
+                for name, cd in all_cells_data.items()}
+    return (cells_gz, _dumps(top_names), _dumps(cell_children),
+            init_cell, _unit_label(lib.unit), deferred)
+
+
 def show_interactive_viewer():
     st.markdown("""<style>
 [data-testid="stFileUploaderDropzone"]{
@@ -160,72 +797,67 @@ def show_interactive_viewer():
         uploaded_lyp = st.file_uploader("Layer Properties (optional)", type=["lyp"], key="lyp_uploader")
 
     if uploaded_file:
-        gds_path = "temp_view.gds"
-        with open(gds_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
         try:
-            import gdstk
-
+            lyp_id     = uploaded_lyp.file_id if uploaded_lyp else None
+            keep_subpx = st.session_state.get("gds_subpx", False)
             with st.spinner("Rendering layout..."):
-                lib       = gdstk.read_gds(gds_path)
-                top_cells = lib.top_level()
-                if not top_cells:
-                    st.error("No top-level cell found in GDS file.")
-                    return
-
-                layer_fills, layer_frames, layer_names = (
-                    _parse_lyp(uploaded_lyp.read()) if uploaded_lyp
-                    else ({}, {}, {}))
-
-                top_names = [c.name for c in top_cells]
-                try:
-                    all_lib_cells = list(lib.cells)
-                except Exception:
-                    all_lib_cells = list(top_cells)
-
-                non_top = sorted(
-                    [c for c in all_lib_cells if c.name not in top_names],
-                    key=lambda c: c.name)
-                ordered_cells = list(top_cells) + non_top
-
-                cell_children: dict = {}
-                for cell in ordered_cells:
-                    children = []
-                    for ref in getattr(cell, "references", []):
-                        try:
-                            cname = ref.cell.name if ref.cell else ref.cell_name
-                            if cname not in children:
-                                children.append(cname)
-                        except Exception:
-                            pass
-                    cell_children[cell.name] = children
-
-                all_cells_data: dict = {}
-                for cell in ordered_cells:
-                    layers_list, vb_x, vb_y, vb_w, vb_h = _build_cell_data(
-                        cell, layer_fills, layer_frames, layer_names)
-                    if layers_list is not None:
-                        all_cells_data[cell.name] = {
-                            "b": [vb_x, vb_y, vb_w, vb_h],
-                            "l": layers_list,
-                        }
-
-                if not all_cells_data:
-                    st.error("No geometry found in GDS file.")
-                    return
-
-                init_cell = next(
-                    (n for n in top_names if n in all_cells_data),
-                    next(iter(all_cells_data)))
-
-                unit             = _unit_label(lib.unit)
-                all_cells_json   = json.dumps(all_cells_data, separators=(',',':'))
-                top_names_json   = json.dumps(top_names,      separators=(',',':'))
-                cell_tree_json   = json.dumps(cell_children,  separators=(',',':'))
-                init_cell_json   = json.dumps(init_cell)
-
-                html = f"""<!DOCTYPE html>
+                (cells_gz, top_names_json, cell_tree_json,
+                 init_cell, unit, deferred) = _prepare_payload(
+                    uploaded_file.file_id, uploaded_file,
+                    lyp_id, uploaded_lyp, keep_subpx)
+                # Sub-cell selection is read before the widget is drawn:
+                # its options come out of the (cached) payload itself.
+                requested = st.session_state.get("gds_subcells", [])
+                selected  = [n for n in requested if n in deferred]
+                cells_gz  = dict(cells_gz)
+                for name in selected:
+                    gz = _prepare_subcell(
+                        uploaded_file.file_id, uploaded_file,
+                        lyp_id, uploaded_lyp, name, keep_subpx)
+                    if gz is None:
+                        del cells_gz[name]
+                    else:
+                        cells_gz[name] = gz
+        except ValueError as e:
+            st.error(str(e))
+            return
+        except Exception as e:
+            st.error(f"Viewer Error: {e}")
+            return
+
+        if len(selected) != len(requested):   # left from another file
+            st.session_state["gds_subcells"] = selected
+        st.multiselect(
+            "Load sub-cells", deferred, key="gds_subcells",
+            help="Sub-cells are shown flattened in their top cell; "
+                 "select one to browse it on its own.")
+        detail = st.select_slider(
+            "Detail level", list(_DETAIL_LEVELS), value="High", key="gds_detail",
+            help="Lower levels draw curved shapes with simplified outlines "
+                 "while zoomed out, off by up to 1, 4 or 16 pixels; no shape "
+                 "is left out. Zooming in always restores full detail.")
+        lod_px = _DETAIL_LEVELS[detail]
+        st.checkbox(
+            "Show sub-pixel details", key="gds_subpx",
+            help="Keep the outlines of shapes smaller than a pixel in the "
+                 "simplified levels used while zoomed out, instead of "
+                 "drawing them as dots (slower on dense layouts).")
+
+        # Each built cell is served as its own gzipped file and fetched by
+        # the page when opened, so the (possibly huge) payload is neither
+        # copied through the iframe srcdoc nor sent uncompressed. Only the
+        # index of URLs is inline; without a runtime the cells are.
+        entries = []
+        for name, gz in cells_gz.items():
+            if isinstance(gz, dict):
+                value = _dumps(gz)
+            else:
+                url   = _media_url(gz, "application/gzip", f"cell.{name}")
+                value = _dumps(url) if url else gzip.decompress(gz).decode()
+            entries.append(f"{_dumps(name)}:{value}")
+        all_cells_json = "{" + ",".join(entries) + "}"
+
+        html = f"""<!DOCTYPE html>
 <html><head><meta charset="utf-8"><style>
 *{{margin:0;padding:0;box-sizing:border-box}}
 html,body{{height:100%;overflow:hidden;background:#000;
@@ -262,6 +894,8 @@ html,body{{height:100%;overflow:hidden;background:#000;
   background:#000;overflow:hidden;cursor:crosshair;
 }}
 canvas{{display:block;}}
+#cv{{position:relative}}
+#glcv{{position:absolute;left:0;top:0}}
 #selbox{{position:absolute;display:none;pointer-events:none;
   border:1px dashed #7af;background:rgba(80,140,255,.10);}}
 
@@ -291,6 +925,7 @@ canvas{{display:block;}}
   border-bottom:1px solid #dfdfdf;border-right:1px solid #dfdfdf;
 }}
 .gb.grow{{flex:1;display:flex;flex-direction:column;overflow:hidden;min-height:60px}}
+.gb.cells{{flex:0 0 auto;max-height:42%;display:flex;flex-direction:column;overflow:hidden;min-height:0}}
 .gb-title{{
   background:#d4d0c8;
   font:bold 11px "MS Sans Serif",Arial,sans-serif;
@@ -299,7 +934,9 @@ canvas{{display:block;}}
 }}
 
 #cellScroll{{overflow-y:auto;flex:1;padding:1px 0}}
-.tnode{{display:flex;align-items:center;padding:1px 2px 1px 4px;cursor:pointer;white-space:nowrap}}
+#treeSpacer{{position:relative}}
+.tnode{{display:flex;align-items:center;padding:1px 2px 1px 4px;cursor:pointer;white-space:nowrap;
+  position:absolute;left:0;right:0;height:16px}}
 .tnode:hover{{background:#b8c8e0}}
 .tnode.active{{background:#000080;color:#fff}}
 .tnode.active .tn-lbl{{color:#fff}}
@@ -307,7 +944,8 @@ canvas{{display:block;}}
 .tnode.active .tn-tog{{color:#ccc}}
 .tn-lbl{{font:11px "MS Sans Serif",Arial,sans-serif;overflow:hidden;text-overflow:ellipsis}}
 .tn-lbl.toplevel{{font-weight:bold}}
-.tn-children{{display:none;}}
+.tn-lbl.lazy{{color:#555;font-style:italic}}
+.tn-lbl.nodata{{color:#888}}
 
 .lyr-ctrl{{display:flex;gap:2px;padding:2px 3px;border-bottom:1px solid #b0b0b0}}
 .sbtn{{
@@ -320,13 +958,21 @@ canvas{{display:block;}}
 #layerScroll{{overflow-y:auto;flex:1;padding:1px 1px}}
 .lr{{display:flex;align-items:center;gap:3px;padding:1px 3px;cursor:pointer;user-select:none;}}
 .lr:hover{{background:#b0b8c8}}
-.lr input[type=checkbox]{{width:11px;height:11px;margin:0;flex-shrink:0;cursor:pointer;}}
+.lr:focus-visible{{outline:1px dotted #000;outline-offset:-1px}}
+.lr-cb{{width:11px;height:11px;flex-shrink:0;background:#fff;
+  border:1px solid;border-color:#808080 #fff #fff #808080;
+  font:bold 9px/9px Arial,sans-serif;text-align:center}}
+.lr-cb::after{{content:"\\2713"}}
 .swatch{{flex-shrink:0;
   border-top:1px solid #808080;border-left:1px solid #808080;
   border-bottom:1px solid #dfdfdf;border-right:1px solid #dfdfdf;}}
 .lr label{{font:11px "MS Sans Serif",Arial,sans-serif;
   white-space:nowrap;overflow:hidden;text-overflow:ellipsis;max-width:108px;cursor:pointer}}
-.lr.hidden label,.lr.hidden .lr-lnum{{color:#909090;text-decoration:line-through}}
+.lr.hidden label,.lr.hidden .lr-lnum,
+#layerScroll.all-hidden .lr:not(.shown) label,
+#layerScroll.all-hidden .lr:not(.shown) .lr-lnum{{color:#909090;text-decoration:line-through}}
+.lr.hidden .lr-cb::after,
+#layerScroll.all-hidden .lr:not(.shown) .lr-cb::after{{content:""}}
 .lr-lnum{{font:9px monospace;color:#606060;flex-shrink:0}}
 </style></head><body><div id="shell">
 
@@ -342,14 +988,15 @@ canvas{{display:block;}}
 
 <div id="body">
   <div id="wrap">
+    <canvas id="glcv"></canvas>
     <canvas id="cv"></canvas>
     <div id="selbox"></div>
     <div id="ruler"><div id="rbar"></div><div id="rlabel"></div></div>
   </div>
   <div id="sidebar">
-    <div class="gb" style="flex:0 0 auto;max-height:42%">
+    <div class="gb cells">
       <div class="gb-title">&#128194; Cells</div>
-      <div id="cellScroll"></div>
+      <div id="cellScroll"><div id="treeSpacer"></div></div>
     </div>
     <div class="gb grow">
       <div class="gb-title">&#9632; Layers</div>
@@ -369,7 +1016,7 @@ canvas{{display:block;}}
 
 </div>
 
-<script>
+<script id="sharedSrc">
 // ═══════════════════════════════════════════════════════════════════════════
 // KLayout built-in stipple/dither patterns — transcribed from
 // layDitherPattern.cc in the KLayout source.
@@ -504,39 +1151,17 @@ const STIPPLES = [
   ['........','........','********','********'],
 ];
 
-// ═══════════════════════════════════════════════════════════════════════════
-const ALL_CELLS = {all_cells_json};
-const TOP_NAMES = {top_names_json};
-const CELL_TREE = {cell_tree_json};
-const INIT_CELL = {init_cell_json};
-const UNIT      = "{unit}";
-
-// ── State ─────────────────────────────────────────────────────────────────
-let LAYERS = [], GX, GY, GW, GH;
-let fillPatterns = [], frameColors = [];
-const hiddenNums = new Set();
-let showGrid = false;
-let sc, tx, ty, iSc, iTx, iTy;
-let activeCellName = '';
-
-const wrap = document.getElementById('wrap');
-const cv   = document.getElementById('cv');
-const sel  = document.getElementById('selbox');
-const ctx  = cv.getContext('2d');
-
-function resizeCanvas(){{
-  cv.width  = wrap.offsetWidth  || 800;
-  cv.height = wrap.offsetHeight || 580;
-}}
-
-// ── Build a CanvasPattern from a KLayout stipple bitmap ───────────────────
+// ── Stipple bitmap → canvas ───────────────────────────────────────────────
 // Key: the stipple is in SCREEN pixels, constant size regardless of zoom.
 // Only pixels where bitmap='*' are drawn in fillColor; '.' stays transparent.
 // This is exactly how KLayout renders — you see through the gaps.
-function buildStipplePattern(fillColor, stipIdx){{
+// Shared by the sidebar swatches and the renderer (which may be a worker,
+// hence OffscreenCanvas when available).
+function stippleCanvas(fillColor, stipIdx){{
   const bmp = STIPPLES[stipIdx] || STIPPLES[0];
   const h = bmp.length, w = bmp[0].length;
-  const oc = document.createElement('canvas');
+  const oc = typeof OffscreenCanvas !== 'undefined'
+    ? new OffscreenCanvas(w, h) : document.createElement('canvas');
   oc.width = w; oc.height = h;
   const p  = oc.getContext('2d');
 
@@ -567,164 +1192,152 @@ function buildStipplePattern(fillColor, stipIdx){{
     }}
   }}
   p.putImageData(img, 0, 0);
-  return ctx.createPattern(oc, 'repeat');
+  return oc;
 }}
 
-// Sidebar swatch: fill a small canvas with the stipple pattern on dark bg
-function drawSwatchOn(sw, fillColor, frameColor, stipIdx){{
-  const sc2 = sw.getContext('2d');
-  sc2.fillStyle = '#000';
-  sc2.fillRect(0, 0, sw.width, sw.height);
-
-  const pat = buildStipplePattern(fillColor, stipIdx);
-  sc2.fillStyle = pat;
-  sc2.fillRect(0, 0, sw.width, sw.height);
-
-  sc2.strokeStyle = frameColor;
-  sc2.lineWidth = 1;
-  sc2.strokeRect(0.5, 0.5, sw.width-1, sw.height-1);
+function niceNum(x){{
+  if(x<=0) return 1;
+  const m=Math.pow(10,Math.floor(Math.log10(x))), f=x/m;
+  return f<1.5?m : f<3.5?2*m : f<7.5?5*m : 10*m;
 }}
+</script>
 
-// ── Layer panel ───────────────────────────────────────────────────────────
-function buildLayerPanel(){{
-  const list = document.getElementById('layerScroll');
-  list.innerHTML = '';
-  LAYERS.forEach(([lnum, lname, fill, frame, stipIdx], i) => {{
-    const row = document.createElement('div');
-    row.className = 'lr' + (hiddenNums.has(lnum) ? ' hidden' : '');
-
-    const cb = document.createElement('input');
-    cb.type='checkbox'; cb.id='lc'+i; cb.checked=!hiddenNums.has(lnum);
-
-    const sw = document.createElement('canvas');
-    sw.className='swatch'; sw.width=22; sw.height=14;
-
-    const lnum_span = document.createElement('span');
-    lnum_span.className = 'lr-lnum';
-    lnum_span.textContent = lnum;
-
-    const lbl = document.createElement('label');
-    lbl.htmlFor = 'lc'+i;
-    lbl.textContent = lname;
-    lbl.title = lname + ' (layer ' + lnum + ')';
-
-    row.append(cb, sw, lnum_span, lbl);
-    list.appendChild(row);
-    drawSwatchOn(sw, fill, frame, stipIdx);
-
-    const toggle = () => {{
-      if(cb.checked) hiddenNums.delete(lnum); else hiddenNums.add(lnum);
-      row.className = 'lr' + (hiddenNums.has(lnum) ? ' hidden' : '');
-      scheduleRender();
-    }};
-    cb.addEventListener('change', toggle);
-    row.addEventListener('click', e => {{ if(e.target!==cb && e.target!==lbl){{ cb.checked=!cb.checked; toggle(); }} }});
-  }});
+<script id="renderSrc" type="text/plain">
+// ══════════════════════════════════════════════════════════════════════════
+// RENDER — runs in a Web Worker on the transferred OffscreenCanvas, so heavy
+// frames never block the page; falls back to the main thread otherwise.
+// Either way it only sees these messages:
+//   {{type:'init',  canvas, glCanvas, w, h}}   {{type:'cell', name, layers, quant}}
+//   {{type:'show',  name}}              {{type:'frame', sc, tx, ty, grid, hidden}}
+// KLayout-style + performance optimizations:
+//   - LOD: polygons smaller than 2px become one batched 1px dot each
+//   - LOD: draw the coarsest simplified variant whose error is within
+//     LOD_PX pixels (the "Detail level" setting)
+//   - Cull: visit only the spatial bins the viewport overlaps
+//   - Layers mostly in view are filled as one cached Path2D per LOD level
+//   - Pans blit a scene baked with a margin; zoom or visibility redraws it
+//   - Dense cells (triangulated server-side) go to WebGL2 instead
+//   - Throttled to one render per animation frame
+// ══════════════════════════════════════════════════════════════════════════
+const IN_WORKER = typeof document === 'undefined';
+const LOD_PX    = {lod_px};
+const CELLS = {{}}, QUANTS = {{}};
+let canvas, ctx, glCanvas;
+let qx = 0, qy = 0, qs = 1;   // world = origin + quantum * stored vertex
+let LAYERS = [], fillPatterns = [], frameColors = [];
+let hiddenNums = new Set(), showGrid = false, sc = 1, tx = 0, ty = 0;
+const PAT_CACHE = new Map();   // 'fill|stipple' -> CanvasPattern, across cells
+
+function stipplePattern(fill, stipIdx){{
+  const k = fill + '|' + stipIdx;
+  let p = PAT_CACHE.get(k);
+  if(!p){{
+    p = ctx.createPattern(stippleCanvas(fill, stipIdx), 'repeat');
+    PAT_CACHE.set(k, p);
+  }}
+  return p;
 }}
 
-document.getElementById('bShowAll').onclick = () => {{
-  hiddenNums.clear();
-  document.querySelectorAll('#layerScroll .lr').forEach(r => {{
-    r.className='lr'; r.querySelector('input').checked=true; }});
-  scheduleRender();
-}};
-document.getElementById('bHideAll').onclick = () => {{
-  LAYERS.forEach(([lnum]) => hiddenNums.add(lnum));
-  document.querySelectorAll('#layerScroll .lr').forEach(r => {{
-    r.className='lr hidden'; r.querySelector('input').checked=false; }});
-  scheduleRender();
-}};
-
-// ── Cell hierarchy tree ───────────────────────────────────────────────────
-function makeTreeNode(name, depth){{
-  const children = (CELL_TREE[name] || []).filter(c => ALL_CELLS[c]);
-  const hasData  = !!ALL_CELLS[name];
-  const isTop    = TOP_NAMES.includes(name);
-  const wrap2    = document.createElement('div');
-
-  const row = document.createElement('div');
-  row.className = 'tnode' + (name===activeCellName ? ' active' : '');
-  row.style.paddingLeft = (4 + depth*14) + 'px';
-
-  const tog = document.createElement('span');
-  tog.className = 'tn-tog';
-  tog.textContent = children.length ? '▶' : ' ';
-
-  const lbl = document.createElement('span');
-  lbl.className = 'tn-lbl' + (isTop ? ' toplevel' : '');
-  lbl.textContent = name; lbl.title = name;
-
-  row.append(tog, lbl);
-  wrap2.appendChild(row);
-
-  const childBox = document.createElement('div');
-  childBox.className = 'tn-children';
-  wrap2.appendChild(childBox);
-
-  let expanded = false;
-  if(children.length){{
-    tog.onclick = e => {{
-      e.stopPropagation();
-      expanded = !expanded;
-      tog.textContent = expanded ? '▼' : '▶';
-      childBox.style.display = expanded ? 'block' : 'none';
-      if(expanded && !childBox.children.length)
-        children.forEach(c => childBox.appendChild(makeTreeNode(c, depth+1)));
-    }};
+function handle(msg){{
+  switch(msg.type){{
+    case 'init':
+      canvas = msg.canvas; canvas.width = msg.w; canvas.height = msg.h;
+      ctx = canvas.getContext('2d');
+      glCanvas = msg.glCanvas; glCanvas.width = msg.w; glCanvas.height = msg.h;
+      break;
+    case 'cell':
+      // [10] culling grid, [11] layer extent, [12] Path2D per LOD level,
+      // [13] polygons each LOD level emptied
+      msg.layers.forEach(L => {{
+        L[10] = unpackBins(L[10]); L[11] = layerExtent(L[7]); L[12] = []; L[13] = [];
+      }});
+      CELLS[msg.name] = msg.layers;
+      QUANTS[msg.name] = msg.quant;
+      break;
+    case 'drop':
+      delete CELLS[msg.name]; delete QUANTS[msg.name];
+      break;
+    case 'show':
+      LAYERS = CELLS[msg.name] || [];
+      [qx, qy, qs] = QUANTS[msg.name] || [0, 0, 1];
+      fillPatterns = LAYERS.map(([,,fill,,stipIdx]) => stipplePattern(fill, stipIdx));
+      frameColors  = LAYERS.map(([,,,frame]) => frame);
+      glShow();
+      break;
+    case 'frame':
+      ({{sc, tx, ty}} = msg);
+      showGrid = msg.grid; hiddenNums = new Set(msg.hidden);
+      // The page already coalesces to one frame message per vsync; a busy
+      // worker may still queue several, so it coalesces again.
+      if(IN_WORKER) scheduleRender(); else render();
+      break;
   }}
-  if(hasData){{
-    row.onclick = () => {{
-      document.querySelectorAll('.tnode.active').forEach(el => el.classList.remove('active'));
-      row.classList.add('active');
-      loadCell(name);
-    }};
-  }} else {{ lbl.style.color = '#888'; }}
-  return wrap2;
 }}
 
-function buildCellTree(){{
-  const container = document.getElementById('cellScroll');
-  container.innerHTML = '';
-  TOP_NAMES.forEach(name => container.appendChild(makeTreeNode(name, 0)));
-  const reachable = new Set();
-  function mark(n){{ (CELL_TREE[n]||[]).forEach(c=>{{ if(!reachable.has(c)){{ reachable.add(c); mark(c); }} }}); }}
-  TOP_NAMES.forEach(n=>{{ reachable.add(n); mark(n); }});
-  Object.keys(ALL_CELLS).forEach(n => {{
-    if(!reachable.has(n)) container.appendChild(makeTreeNode(n, 0));
+let renderScheduled = false;
+function scheduleRender(){{
+  if(renderScheduled) return;
+  renderScheduled = true;
+  const next = typeof requestAnimationFrame === 'function'
+    ? requestAnimationFrame : f => setTimeout(f, 0);
+  next(()=>{{
+    renderScheduled = false;
+    render();
   }});
 }}
 
-// ── Load cell ─────────────────────────────────────────────────────────────
-function loadCell(name){{
-  const cd = ALL_CELLS[name]; if(!cd) return;
-  activeCellName = name;
-  LAYERS = cd.l;
-  [GX,GY,GW,GH] = cd.b;
-
-  fillPatterns = LAYERS.map(([,,fill,,stipIdx]) => buildStipplePattern(fill, stipIdx));
-  frameColors  = LAYERS.map(([,,,frame]) => frame);
+// ── Spatial bins ──────────────────────────────────────────────────────────
+// layer[10] is the server-built grid (see _grid_index): polygons that fit in
+// one bin are bucketed by bbox centre, so one overlapping the viewport has
+// its centre at most one bin away from it; bigger polygons are in ``big``
+// and are always bbox-tested. Each polygon is in exactly one list, so no
+// de-duplication is needed.
+function unpackBins([x0, y0, size, nx, ny, start, idx, big]){{
+  return {{x0, y0, size, nx, ny, start, idx, big}};
+}}
 
-  buildLayerPanel();
-  document.getElementById('cellName').textContent = name;
-  if(cv.width){{ fitView(); render(); }}
+function layerExtent(B){{
+  let x0=Infinity, y0=Infinity, x1=-Infinity, y1=-Infinity;
+  for(let o=0; o<B.length; o+=4){{
+    if(B[o]  <x0) x0=B[o];   if(B[o+1]<y0) y0=B[o+1];
+    if(B[o+2]>x1) x1=B[o+2]; if(B[o+3]>y1) y1=B[o+3];
+  }}
+  return [x0, y0, x1, y1];
 }}
 
-// ── View ──────────────────────────────────────────────────────────────────
-function fitView(){{
-  const W=cv.width, H=cv.height;
-  sc = Math.min(W/GW, H/GH)*0.97;
-  tx = (W-GW*sc)/2 - GX*sc;
-  ty = (H-GH*sc)/2 - GY*sc;
-  iSc=sc; iTx=tx; iTy=ty;
-  updateZoom();
+// ── Whole-layer paths ─────────────────────────────────────────────────────
+// When most of a layer is on screen, culling saves little: fill and stroke
+// it as one retained Path2D (built once per cell and LOD level, in stored
+// vertex units) instead of a path per polygon. Polygons all share one
+// winding (see _orient), so the nonzero fill keeps overlaps solid.
+const HAS_PATH2D = typeof Path2D !== 'undefined';
+const WHOLE_LAYER_FRAC = 0.5;   // visible share of the layer's extent
+// Culled polygons are likewise batched into one path, filled and stroked
+// every BATCH_POLYS polygons (very long paths stall some canvas backends).
+const BATCH_POLYS = 200;
+
+// Polygons a LOD level left empty (sub-pixel ones, see _build_cell_data).
+function emptiedPolys(O){{
+  const out = [];
+  for(let pi=0; pi<O.length-1; pi++) if(O[pi] === O[pi+1]) out.push(pi);
+  return Uint32Array.from(out);
 }}
-function updateZoom(){{
-  document.getElementById('zoomLbl').textContent = Math.round(sc/iSc*100)+'%';
+
+function layerPath(C, O){{
+  const p = new Path2D();
+  for(let pi=0; pi<O.length-1; pi++){{
+    const s=O[pi], e=O[pi+1];
+    if(s === e) continue;   // emptied at this LOD level
+    p.moveTo(C[s], C[s+1]);
+    for(let v=s+2; v<e; v+=2) p.lineTo(C[v], C[v+1]);
+    p.closePath();
+  }}
+  return p;
 }}
 
 // ── Grid ──────────────────────────────────────────────────────────────────
 function drawGrid(){{
-  const W=cv.width, H=cv.height, uPx=1/sc;
+  const W=canvas.width, H=canvas.height, uPx=1/sc;
   let minor=niceNum(uPx*60), major=minor*5;
   ctx.save();
   ctx.strokeStyle='rgba(255,255,255,0.08)'; ctx.lineWidth=1;
@@ -748,81 +1361,702 @@ function drawGridLines(W,H,step){{
 }}
 function fmtCoord(v){{ return (Math.abs(v)<1000?+v.toPrecision(4):Math.round(v))+''; }}
 
-function niceNum(x){{
-  if(x<=0) return 1;
-  const m=Math.pow(10,Math.floor(Math.log10(x))), f=x/m;
-  return f<1.5?m : f<3.5?2*m : f<7.5?5*m : 10*m;
+// ── WebGL2 ────────────────────────────────────────────────────────────────
+// Cells the server triangulated (layer[9], only above ~20k polygons) draw
+// each layer with two drawElements calls — stippled triangles, then the
+// outline edges as LINES — instead of a fill()/stroke() per polygon. The GL
+// canvas sits under the 2D one, which then only carries the grid.
+const GL_VS = `#version 300 es
+in vec2 aPos;
+uniform mat3 uProj;   // world -> clip, i.e. the current pan/zoom
+void main(){{ gl_Position = vec4((uProj * vec3(aPos, 1.0)).xy, 0.0, 1.0); }}`;
+const GL_FS = `#version 300 es
+precision mediump float;
+uniform sampler2D uStip;
+uniform bool  uUseStip;
+uniform float uH;
+uniform vec4  uColor;
+out vec4 outColor;
+void main(){{
+  // Stipple in screen pixels, top-left anchored like the Canvas2D pattern.
+  if(uUseStip){{
+    ivec2 p = ivec2(gl_FragCoord.x, uH - gl_FragCoord.y);
+    if(texelFetch(uStip, p % textureSize(uStip, 0), 0).r < 0.5) discard;
+  }}
+  outColor = uColor;
+}}`;
+let gl = null, glProg, glU, glLayers = [], useGL = false;
+const glStipTex = {{}};
+
+function glInit(){{
+  if(gl) return true;
+  if(gl === undefined) return false;   // already failed once
+  gl = glCanvas.getContext('webgl2', {{antialias:false}});
+  if(!gl){{ gl = undefined; return false; }}
+  const sh = (type, src) => {{
+    const s = gl.createShader(type);
+    gl.shaderSource(s, src); gl.compileShader(s);
+    return s;
+  }};
+  glProg = gl.createProgram();
+  gl.attachShader(glProg, sh(gl.VERTEX_SHADER, GL_VS));
+  gl.attachShader(glProg, sh(gl.FRAGMENT_SHADER, GL_FS));
+  gl.bindAttribLocation(glProg, 0, 'aPos');
+  gl.linkProgram(glProg);
+  if(!gl.getProgramParameter(glProg, gl.LINK_STATUS)){{ gl = undefined; return false; }}
+  glU = {{}};
+  for(const u of ['uProj','uStip','uUseStip','uH','uColor'])
+    glU[u] = gl.getUniformLocation(glProg, u);
+  return true;
 }}
-function updateRuler(){{
-  const gpx=1/sc, gl=niceNum(gpx*120), bp=gl*sc;
-  document.getElementById('rbar').style.width=bp+'px';
-  document.getElementById('rlabel').textContent=
-    (gl%1===0?gl:gl.toPrecision(3))+' '+UNIT;
+
+function glColor(hex){{
+  const v = parseInt(hex.slice(1), 16);
+  return hex.length === 7 ? [(v>>16&255)/255, (v>>8&255)/255, (v&255)/255, 1] : [1,1,1,1];
 }}
 
-// ══════════════════════════════════════════════════════════════════════════
-// RENDER — KLayout-style + performance optimizations:
-//   - LOD: skip polygons smaller than 2px (sub-pixel at zoom-out)
-//   - Throttled to one render per animation frame
-// ══════════════════════════════════════════════════════════════════════════
-let renderScheduled = false;
-function scheduleRender(){{
-  if(renderScheduled) return;
-  renderScheduled = true;
-  requestAnimationFrame(()=>{{
-    renderScheduled = false;
-    render();
+// One R8 texture per stipple index, '*' = 255.
+function glStipple(idx){{
+  if(glStipTex[idx]) return glStipTex[idx];
+  const bmp = STIPPLES[idx] || STIPPLES[0];
+  const h = bmp.length, w = bmp[0].length, px = new Uint8Array(w*h);
+  for(let y=0;y<h;y++) for(let x=0;x<w;x++) px[y*w+x] = bmp[y][x]==='*' ? 255 : 0;
+  const t = gl.createTexture();
+  gl.bindTexture(gl.TEXTURE_2D, t);
+  gl.pixelStorei(gl.UNPACK_ALIGNMENT, 1);
+  gl.texImage2D(gl.TEXTURE_2D, 0, gl.R8, w, h, 0, gl.RED, gl.UNSIGNED_BYTE, px);
+  gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MIN_FILTER, gl.NEAREST);
+  gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MAG_FILTER, gl.NEAREST);
+  return glStipTex[idx] = t;
+}}
+
+// Upload the shown cell's layers; the previous cell's buffers are freed.
+function glShow(){{
+  if(gl) glLayers.forEach(G => {{
+    gl.deleteVertexArray(G.vao); gl.deleteBuffer(G.vbo);
+    gl.deleteBuffer(G.tri); gl.deleteBuffer(G.edge);
   }});
+  glLayers = [];
+  useGL = LAYERS.some(L => L[9].length) && glInit();
+  if(!useGL) return;
+  glLayers = LAYERS.map(L => {{
+    const C = L[5], O = L[6];
+    const edges = new Uint32Array(C.length);   // two indices per vertex
+    for(let pi=0, k=0; pi<O.length-1; pi++){{
+      const a = O[pi]/2, b = O[pi+1]/2;
+      for(let v=a; v<b; v++){{ edges[k++] = v; edges[k++] = v+1<b ? v+1 : a; }}
+    }}
+    const G = {{vao: gl.createVertexArray(), vbo: gl.createBuffer(),
+               tri: gl.createBuffer(), edge: gl.createBuffer(),
+               nTri: L[9].length, nEdge: edges.length,
+               fill: glColor(L[2]), frame: glColor(L[3]), stip: glStipple(L[4])}};
+    gl.bindVertexArray(G.vao);
+    gl.bindBuffer(gl.ARRAY_BUFFER, G.vbo);
+    gl.bufferData(gl.ARRAY_BUFFER, C, gl.STATIC_DRAW);
+    gl.enableVertexAttribArray(0);
+    gl.vertexAttribPointer(0, 2, C instanceof Int16Array ? gl.SHORT : gl.INT, false, 0, 0);
+    gl.bindVertexArray(null);
+    gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, G.tri);
+    gl.bufferData(gl.ELEMENT_ARRAY_BUFFER, L[9], gl.STATIC_DRAW);
+    gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, G.edge);
+    gl.bufferData(gl.ELEMENT_ARRAY_BUFFER, edges, gl.STATIC_DRAW);
+    return G;
+  }});
+}}
+
+function glRender(){{
+  const W=glCanvas.width, H=glCanvas.height;
+  gl.viewport(0, 0, W, H);
+  gl.clearColor(0, 0, 0, 1);
+  gl.clear(gl.COLOR_BUFFER_BIT);
+  gl.useProgram(glProg);
+  const k = qs*sc, ex = qx*sc+tx, ey = qy*sc+ty;   // stored vertex -> pixel
+  gl.uniformMatrix3fv(glU.uProj, false,
+    [2*k/W, 0, 0,  0, -2*k/H, 0,  2*ex/W-1, 1-2*ey/H, 1]);
+  gl.uniform1f(glU.uH, H);
+  gl.uniform1i(glU.uStip, 0);
+  gl.activeTexture(gl.TEXTURE0);
+  for(let li=0; li<LAYERS.length; li++){{
+    if(hiddenNums.has(LAYERS[li][0])) continue;
+    const G = glLayers[li];
+    gl.bindVertexArray(G.vao);
+    gl.bindTexture(gl.TEXTURE_2D, G.stip);
+    gl.uniform1i(glU.uUseStip, 1);
+    gl.uniform4fv(glU.uColor, G.fill);
+    gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, G.tri);
+    gl.drawElements(gl.TRIANGLES, G.nTri, gl.UNSIGNED_INT, 0);
+    gl.uniform1i(glU.uUseStip, 0);
+    gl.uniform4fv(glU.uColor, G.frame);
+    gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, G.edge);
+    gl.drawElements(gl.LINES, G.nEdge, gl.UNSIGNED_INT, 0);
+  }}
+  gl.bindVertexArray(null);
 }}
+
+// Per-pixel stamps for de-duplicating dots; a new stamp per layer and frame
+// means the buffer never needs clearing.
+let dotMask = new Uint32Array(0), dotStamp = 0;
+
 function render(){{
-  const W=cv.width, H=cv.height;
+  const W=canvas.width, H=canvas.height;
+  if(useGL){{
+    ctx.clearRect(0,0,W,H);   // let the GL canvas underneath show through
+    glRender();
+    if(showGrid) drawGrid();
+    return;
+  }}
   ctx.fillStyle='#000';
   ctx.fillRect(0,0,W,H);
   if(showGrid) drawGrid();
 
+  // Panning only changes tx/ty: reuse the baked scene while the view stays
+  // inside its margin. The blit is rounded to whole pixels, so geometry may
+  // sit up to half a pixel off until the next bake.
+  const hid = [...hiddenNums].join();
+  let dx = bake ? Math.round(tx - bake.tx) : 0, dy = bake ? Math.round(ty - bake.ty) : 0;
+  if(!bake || bake.sc !== sc || bake.hid !== hid || bake.layers !== LAYERS ||
+     bake.W !== W || bake.H !== H || Math.abs(dx) > bake.pw || Math.abs(dy) > bake.ph){{
+    bakeScene(W, H, hid);
+    dx = dy = 0;
+  }}
+  ctx.drawImage(bake.canvas, dx - bake.pw, dy - bake.ph);
+}}
+
+// ── Pan cache ─────────────────────────────────────────────────────────────
+// The 2D scene is drawn on a transparent canvas BAKE_PAD of the view larger
+// on every side, made like the visible one so the layer patterns work on
+// both; render() blits it over the background and grid.
+const BAKE_PAD = 0.5;
+let bake = null;   // {{canvas, ctx, sc, tx, ty, hid, layers, W, H, pw, ph}}
+
+function bakeScene(W, H, hid){{
+  const pw = Math.ceil(W*BAKE_PAD), ph = Math.ceil(H*BAKE_PAD);
+  const bw = W + 2*pw, bh = H + 2*ph;
+  if(!bake || bake.canvas.width !== bw || bake.canvas.height !== bh){{
+    const c = IN_WORKER ? new OffscreenCanvas(bw, bh) : document.createElement('canvas');
+    c.width = bw; c.height = bh;
+    bake = {{canvas: c, ctx: c.getContext('2d')}};
+  }}
+  Object.assign(bake, {{sc, tx, ty, hid, layers: LAYERS, W, H, pw, ph}});
+  const main = ctx;
+  ctx = bake.ctx;
+  ctx.setTransform(1, 0, 0, 1, 0, 0);
+  ctx.clearRect(0, 0, bw, bh);
+  drawLayers(bw, bh, tx + pw, ty + ph);
+  ctx = main;
+}}
+
+// Draw every visible layer with the view offset (tx, ty) on a W x H target.
+function drawLayers(W, H, tx, ty){{
   const wxMin=-tx/sc, wyMin=-ty/sc;
   const wxMax=(W-tx)/sc, wyMax=(H-ty)/sc;
-  const MIN_PX = 2;  // LOD: skip polys smaller than this in screen space
+  const MIN_PX = 2;  // LOD: polys smaller than this are drawn as a dot
+  if(dotMask.length !== W*H){{ dotMask = new Uint32Array(W*H); dotStamp = 0; }}
 
   for(let li=0; li<LAYERS.length; li++){{
-    const [lnum,,,,, polys, bounds] = LAYERS[li];
-    if(hiddenNums.has(lnum)) continue;
+    const layer = LAYERS[li];
+    if(hiddenNums.has(layer[0])) continue;
+    const [lx0, ly0, lx1, ly1] = layer[11];
+    const iw = Math.min(lx1, wxMax) - Math.max(lx0, wxMin);
+    const ih = Math.min(ly1, wyMax) - Math.max(ly0, wyMin);
+    if(iw < 0 || ih < 0) continue;   // layer entirely off screen
+
+    let C = layer[5], O = layer[6], lod = 0;
+    const B = layer[7];
+    for(const [eps, lc, lo] of layer[8]){{
+      if(eps > LOD_PX/sc) break;
+      C = lc; O = lo; lod++;
+    }}
 
+    // Vertices are quantized integers: the canvas transform maps them to
+    // pixels, so paths are built from the raw values. Pattern and line
+    // width are given in pixels and therefore divided by the scale.
+    const k = qs*sc, ex = qx*sc+tx, ey = qy*sc+ty;
     const pat   = fillPatterns[li];
     const frc   = frameColors[li];
-    pat.setTransform(new DOMMatrix([1,0,0,1, tx%1, ty%1]));
+    pat.setTransform(new DOMMatrix([1/k,0,0,1/k, (tx%1-ex)/k, (ty%1-ey)/k]));
+    ctx.setTransform(k, 0, 0, k, ex, ey);
+    ctx.fillStyle   = pat;
+    ctx.strokeStyle = frc;
+    ctx.lineWidth   = 1/k;
+
+    // LOD: sub-pixel polygons only mark their pixel (huge win when
+    // zoomed out); the dots are filled in one go after the layer.
+    const dots = [], stamp = ++dotStamp;
+    const markDot = o => {{
+      const px = Math.floor((B[o]+B[o+2])/2*sc+tx), py = Math.floor((B[o+1]+B[o+3])/2*sc+ty);
+      if(px<0||py<0||px>=W||py>=H) return;
+      const m = py*W + px;
+      if(dotMask[m] !== stamp){{ dotMask[m] = stamp; dots.push(m); }}
+    }};
+
+    if(HAS_PATH2D && iw*ih >= WHOLE_LAYER_FRAC*(lx1-lx0)*(ly1-ly0)){{
+      const path = layer[12][lod] || (layer[12][lod] = layerPath(C, O));
+      ctx.fill(path);
+      ctx.stroke(path);
+      // Polygons this level left out are sub-pixel: dots only.
+      const gone = layer[13][lod] || (layer[13][lod] = emptiedPolys(O));
+      for(let j=0; j<gone.length; j++) markDot(gone[j]*4);
+      drawDots(dots, W, frc);
+      continue;
+    }}
 
-    for(let pi=0; pi<polys.length; pi++){{
-      const [bx0,by0,bx1,by1] = bounds[pi];
-      if(bx1<wxMin||bx0>wxMax||by1<wyMin||by0>wyMax) continue;
+    let batched = 0;
+    const flush = () => {{
+      if(!batched) return;
+      ctx.fill();
+      ctx.stroke();
+      ctx.beginPath();
+      batched = 0;
+    }};
+    ctx.beginPath();
+    const drawPoly = pi => {{
+      const o=pi*4;
+      const bx0=B[o], by0=B[o+1], bx1=B[o+2], by1=B[o+3];
+      if(bx1<wxMin||bx0>wxMax||by1<wyMin||by0>wyMax) return;
 
-      // LOD: skip sub-pixel polygons (huge win when zoomed out)
       const sw=(bx1-bx0)*sc, sh=(by1-by0)*sc;
-      if(sw<MIN_PX&&sh<MIN_PX) continue;
+      if(sw<MIN_PX&&sh<MIN_PX){{ markDot(o); return; }}
 
-      const poly = polys[pi];
-      ctx.beginPath();
-      ctx.moveTo(poly[0]*sc+tx, poly[1]*sc+ty);
-      for(let k=2; k<poly.length; k+=2)
-        ctx.lineTo(poly[k]*sc+tx, poly[k+1]*sc+ty);
+      const s=O[pi], e=O[pi+1];
+      if(s === e) return;
+      ctx.moveTo(C[s], C[s+1]);
+      for(let v=s+2; v<e; v+=2) ctx.lineTo(C[v], C[v+1]);
       ctx.closePath();
+      if(++batched === BATCH_POLYS) flush();
+    }};
 
-      ctx.fillStyle = pat;
-      ctx.fill();
-      ctx.strokeStyle = frc;
-      ctx.lineWidth = 1;
-      ctx.stroke();
+    // Bins overlapping the viewport, plus a one-bin margin.
+    const G = layer[10];
+    const gx0 = Math.max(0, Math.floor((wxMin-G.x0)/G.size) - 1);
+    const gx1 = Math.min(G.nx-1, Math.floor((wxMax-G.x0)/G.size) + 1);
+    const gy0 = Math.max(0, Math.floor((wyMin-G.y0)/G.size) - 1);
+    const gy1 = Math.min(G.ny-1, Math.floor((wyMax-G.y0)/G.size) + 1);
+    for(let gy=gy0; gy<=gy1; gy++){{
+      for(let b=gy*G.nx+gx0, bEnd=gy*G.nx+gx1; b<=bEnd; b++){{
+        for(let k=G.start[b], kEnd=G.start[b+1]; k<kEnd; k++) drawPoly(G.idx[k]);
+      }}
     }}
+    for(let j=0; j<G.big.length; j++) drawPoly(G.big[j]);
+    flush();
+    drawDots(dots, W, frc);
+  }}
+  ctx.setTransform(1, 0, 0, 1, 0, 0);
+}}
+
+// Fill the marked pixels (index = y*W + x) in one go.
+function drawDots(dots, W, color){{
+  if(!dots.length) return;
+  ctx.setTransform(1, 0, 0, 1, 0, 0);
+  ctx.fillStyle = color;
+  ctx.beginPath();
+  for(const m of dots) ctx.rect(m % W, (m / W) | 0, 1, 1);
+  ctx.fill();
+}}
+</script>
+
+<script>
+// ═══════════════════════════════════════════════════════════════════════════
+const ALL_CELLS = {all_cells_json};   // name -> cell, or its URL
+const MAX_CELLS  = 32;          // cells kept decoded, here or in the renderer
+const PREFETCH_MAX = 4;         // top cells warmed before they are opened
+const CELL_URLS  = {{}};          // fetched cells, to re-fetch after eviction
+const FETCHING   = new Map();   // name -> pending fetch
+let   liveCells  = [];          // fetched cells still decoded, least recent first
+let   prefetched = 0;
+const TOP_NAMES = {top_names_json};
+const CELL_TREE = {cell_tree_json};
+const INIT_CELL = {_dumps(init_cell)};
+const UNIT      = "{unit}";
+const TOP_SET   = new Set(TOP_NAMES);
+const CELL_NAMES = Object.keys(ALL_CELLS);
+
+// ── State ─────────────────────────────────────────────────────────────────
+let LAYERS = [], GX, GY, GW, GH;
+const hiddenNums = new Set();
+let showGrid = false;
+let sc, tx, ty, iSc, iTx, iTy;
+let activeCellName = '', wantCell = '';
+let CW = 800, CH = 580;   // canvas size (the canvas itself may be in a worker)
+
+const wrap = document.getElementById('wrap');
+const cv   = document.getElementById('cv');
+const glcv = document.getElementById('glcv');
+const sel  = document.getElementById('selbox');
+let post   = null;        // sends a message to the renderer
+
+// ── Renderer ──────────────────────────────────────────────────────────────
+// Prefer a worker drawing on the transferred canvas; otherwise evaluate the
+// same renderer source here and call its handler directly.
+function startRenderer(){{
+  const shared = document.getElementById('sharedSrc').textContent;
+  const src    = document.getElementById('renderSrc').textContent;
+  if(cv.transferControlToOffscreen && typeof Worker !== 'undefined'){{
+    try{{
+      const blob = new Blob([shared, src, '\\nself.onmessage = e => handle(e.data);'],
+                            {{type:'application/javascript'}});
+      const worker = new Worker(URL.createObjectURL(blob));
+      const off = cv.transferControlToOffscreen();
+      const glOff = glcv.transferControlToOffscreen();
+      worker.postMessage({{type:'init', canvas:off, glCanvas:glOff, w:CW, h:CH}},
+                         [off, glOff]);
+      return (msg, transfer) => worker.postMessage(msg, transfer || []);
+    }} catch(e) {{ /* e.g. workers blocked: draw on the main thread */ }}
   }}
-  updateRuler();
+  const handle = new Function(src + '\\nreturn handle;')();
+  handle({{type:'init', canvas:cv, glCanvas:glcv, w:CW, h:CH}});
+  return msg => handle(msg);
+}}
+
+let frameScheduled = false;
+function scheduleRender(){{
+  if(frameScheduled) return;
+  frameScheduled = true;
+  requestAnimationFrame(()=>{{
+    frameScheduled = false;
+    post({{type:'frame', sc, tx, ty, grid:showGrid, hidden:[...hiddenNums]}});
+    updateRuler();
+  }});
+}}
+
+// Sidebar swatch: fill a small canvas with the stipple pattern on dark bg.
+// Each style is rasterized once; switching cells just copies it.
+const SW_CACHE = new Map();   // 'fill|frame|stipple' -> canvas
+function drawSwatchOn(sw, fillColor, frameColor, stipIdx){{
+  const k = fillColor + '|' + frameColor + '|' + stipIdx;
+  let src = SW_CACHE.get(k);
+  if(!src){{
+    src = document.createElement('canvas');
+    src.width = sw.width; src.height = sw.height;
+    const sc2 = src.getContext('2d');
+    sc2.fillStyle = '#000';
+    sc2.fillRect(0, 0, src.width, src.height);
+
+    const pat = sc2.createPattern(stippleCanvas(fillColor, stipIdx), 'repeat');
+    sc2.fillStyle = pat;
+    sc2.fillRect(0, 0, src.width, src.height);
+
+    sc2.strokeStyle = frameColor;
+    sc2.lineWidth = 1;
+    sc2.strokeRect(0.5, 0.5, src.width-1, src.height-1);
+    SW_CACHE.set(k, src);
+  }}
+  sw.getContext('2d').drawImage(src, 0, 0);
+}}
+
+// ── Layer panel ───────────────────────────────────────────────────────────
+// Row state is drawn by CSS: a row is hidden when it has .hidden, or when
+// #layerScroll has .all-hidden and the row lacks .shown. Show/Hide All thus
+// flip one class and only reset the rows toggled individually since.
+// Each row is a focusable checkbox for keyboards and screen readers, its
+// aria-checked kept in step with the CSS state.
+const layerScroll = document.getElementById('layerScroll');
+const layerOverrides = new Set();   // rows carrying .hidden / .shown
+
+function buildLayerPanel(){{
+  layerScroll.innerHTML = '';
+  layerScroll.classList.remove('all-hidden');
+  layerOverrides.clear();
+  LAYERS.forEach(([lnum, lname, fill, frame, stipIdx]) => {{
+    const row = document.createElement('div');
+    row.className = 'lr' + (hiddenNums.has(lnum) ? ' hidden' : '');
+    row.setAttribute('role', 'checkbox');
+    row.setAttribute('aria-checked', !hiddenNums.has(lnum));
+    row.tabIndex = 0;
+    if(hiddenNums.has(lnum)) layerOverrides.add(row);
+
+    const cb = document.createElement('span');
+    cb.className = 'lr-cb';
+    cb.setAttribute('aria-hidden', 'true');
+
+    const sw = document.createElement('canvas');
+    sw.className='swatch'; sw.width=22; sw.height=14;
+
+    const lnum_span = document.createElement('span');
+    lnum_span.className = 'lr-lnum';
+    lnum_span.textContent = lnum;
+
+    const lbl = document.createElement('label');
+    lbl.textContent = lname;
+    lbl.title = lname + ' (layer ' + lnum + ')';
+
+    row.append(cb, sw, lnum_span, lbl);
+    layerScroll.appendChild(row);
+    drawSwatchOn(sw, fill, frame, stipIdx);
+
+    const toggle = () => {{
+      const hide = !hiddenNums.has(lnum);
+      if(hide) hiddenNums.add(lnum); else hiddenNums.delete(lnum);
+      if(layerScroll.classList.contains('all-hidden')) row.classList.toggle('shown', !hide);
+      else row.classList.toggle('hidden', hide);
+      row.setAttribute('aria-checked', !hide);
+      layerOverrides.add(row);
+      scheduleRender();
+    }};
+    row.addEventListener('click', toggle);
+    row.addEventListener('keydown', e => {{
+      if(e.key !== ' ' && e.key !== 'Enter') return;
+      e.preventDefault();   // no page scroll on Space
+      toggle();
+    }});
+  }});
+}}
+
+function setAllLayers(hidden){{
+  hiddenNums.clear();
+  if(hidden) LAYERS.forEach(([lnum]) => hiddenNums.add(lnum));
+  layerOverrides.forEach(r => r.classList.remove('hidden', 'shown'));
+  layerOverrides.clear();
+  layerScroll.classList.toggle('all-hidden', hidden);
+  for(const r of layerScroll.children) r.setAttribute('aria-checked', !hidden);
+  scheduleRender();
+}}
+document.getElementById('bShowAll').onclick = () => setAllLayers(false);
+document.getElementById('bHideAll').onclick = () => setAllLayers(true);
+
+// ── Cell hierarchy tree ───────────────────────────────────────────────────
+// Virtualized: the expanded tree is flattened into TREE_ROWS and only rows
+// inside the #cellScroll viewport get DOM nodes, recycled from a pool.
+// Expansion is per occurrence, keyed by the path from the root.
+const ROW_H      = 16;
+const cellScroll = document.getElementById('cellScroll');
+const treeSpacer = document.getElementById('treeSpacer');
+const treeOpen   = new Set();
+const rowPool    = [];
+let TREE_ROOTS = [], TREE_ROWS = [];
+
+const childCache = new Map();   // name -> children that have an entry
+function treeChildren(name){{
+  let c = childCache.get(name);
+  if(!c){{
+    c = (CELL_TREE[name] || []).filter(n => ALL_CELLS[n]);
+    childCache.set(name, c);
+  }}
+  return c;
+}}
+
+function flattenTree(){{
+  TREE_ROWS = [];
+  const walk = (name, depth, key) => {{
+    TREE_ROWS.push({{name, depth, key}});
+    if(treeOpen.has(key))
+      treeChildren(name).forEach(c => walk(c, depth+1, key + '/' + c));
+  }};
+  TREE_ROOTS.forEach(n => walk(n, 0, n));
+  treeSpacer.style.height = (TREE_ROWS.length*ROW_H) + 'px';
+}}
+
+function paintTree(){{
+  const first = Math.floor(cellScroll.scrollTop/ROW_H);
+  const last  = Math.min(TREE_ROWS.length,
+                         first + Math.ceil(cellScroll.clientHeight/ROW_H) + 1);
+  while(rowPool.length < last-first){{
+    const row = document.createElement('div');
+    const tog = document.createElement('span'); tog.className = 'tn-tog';
+    const lbl = document.createElement('span');
+    row.append(tog, lbl);
+    treeSpacer.appendChild(row);
+    rowPool.push(row);
+  }}
+  rowPool.forEach((row, j) => {{
+    const i = first + j;
+    if(i >= last){{ row.style.display = 'none'; return; }}
+    const {{name, depth, key}} = TREE_ROWS[i];
+    const isLazy  = !!(ALL_CELLS[name] && ALL_CELLS[name].lazy);
+    const hasData = !!ALL_CELLS[name] && !isLazy;
+    const [tog, lbl] = row.children;
+    row.className = 'tnode' + (name===activeCellName ? ' active' : '');
+    row.dataset.i = i;
+    row.style.display = '';
+    row.style.top = (i*ROW_H) + 'px';
+    row.style.paddingLeft = (4 + depth*14) + 'px';
+    tog.textContent = treeChildren(name).length ? (treeOpen.has(key) ? '▼' : '▶') : ' ';
+    lbl.className = 'tn-lbl' + (TOP_SET.has(name) ? ' toplevel' : '') +
+                    (isLazy ? ' lazy' : hasData ? '' : ' nodata');
+    lbl.textContent = name;
+    lbl.title = isLazy ? name + ' (not loaded \u2014 select it under "Load sub-cells")' : name;
+  }});
+}}
+
+cellScroll.addEventListener('scroll', paintTree, {{passive:true}});
+cellScroll.addEventListener('click', e => {{
+  const row = e.target.closest('.tnode'); if(!row) return;
+  const {{name, key}} = TREE_ROWS[+row.dataset.i];
+  if(e.target.classList.contains('tn-tog') && treeChildren(name).length){{
+    if(treeOpen.has(key)) treeOpen.delete(key); else treeOpen.add(key);
+    flattenTree(); paintTree();
+    return;
+  }}
+  const cd = ALL_CELLS[name];
+  if(cd && cd.lazy){{
+    document.getElementById('cellName').textContent =
+      name + ' \u2014 not loaded; select it under "Load sub-cells"';
+  }} else if(cd) loadCell(name);
+}});
+
+function buildCellTree(){{
+  // Cells reachable from a top cell (BFS, each visited once); the rest
+  // are listed as extra roots.
+  const reachable = new Set(TOP_NAMES), queue = [...TOP_NAMES];
+  for(let i = 0; i < queue.length; i++){{
+    for(const c of CELL_TREE[queue[i]] || [])
+      if(!reachable.has(c)){{ reachable.add(c); queue.push(c); }}
+  }}
+  TREE_ROOTS = TOP_NAMES.concat(CELL_NAMES.filter(n => !reachable.has(n)));
+  flattenTree(); paintTree();
+}}
+
+// ── Load cell ─────────────────────────────────────────────────────────────
+// Geometry arrives as base64 of little-endian typed arrays.
+function unb64(s, T){{
+  const bin = atob(s), u8 = new Uint8Array(bin.length);
+  for(let i=0; i<bin.length; i++) u8[i] = bin.charCodeAt(i);
+  return new T(u8.buffer);
+}}
+
+// Coords pooled by _pool_shapes: copy each polygon's shape out of the
+// pool, shifted by its (dx, dy).
+function unpool(c, Q){{
+  if(typeof c === 'string') return unb64(c, Q);
+  const pool = unb64(c[0], Q), po = unb64(c[1], Uint32Array),
+        sid = unb64(c[2], Uint32Array), d = unb64(c[3], Q);
+  let n = 0;
+  for(let i = 0; i < sid.length; i++) n += po[sid[i]+1] - po[sid[i]];
+  const out = new Q(n);
+  for(let i = 0, k = 0; i < sid.length; i++){{
+    const dx = d[2*i], dy = d[2*i+1], b = po[sid[i]+1];
+    for(let j = po[sid[i]]; j < b; j += 2){{ out[k++] = pool[j] + dx; out[k++] = pool[j+1] + dy; }}
+  }}
+  return out;
+}}
+
+// Cells are served gzipped (without Content-Encoding): inflate here.
+function fetchJSON(url){{
+  return fetch(url).then(r => {{
+    if(!r.ok) throw new Error(r.status + ' ' + r.statusText);
+    return new Response(r.body.pipeThrough(new DecompressionStream('gzip'))).json();
+  }});
+}}
+
+function fetchCell(name){{
+  if(typeof ALL_CELLS[name] !== 'string') return Promise.resolve(ALL_CELLS[name]);
+  if(!FETCHING.has(name)){{
+    const url = ALL_CELLS[name];
+    FETCHING.set(name, fetchJSON(url).then(cd => {{
+      CELL_URLS[name] = url;
+      if(ALL_CELLS[name] === url){{
+        ALL_CELLS[name] = cd;
+        liveCells.push(name);
+        evictCells(name);
+      }}
+      return ALL_CELLS[name];
+    }}).finally(() => FETCHING.delete(name)));
+  }}
+  return FETCHING.get(name);
+}}
+
+// Warm the first few top cells in idle time, one at a time.
+function prefetchCells(){{
+  if(prefetched >= PREFETCH_MAX || liveCells.length >= MAX_CELLS) return;
+  const next = TOP_NAMES.find(n => typeof ALL_CELLS[n] === 'string' && !FETCHING.has(n));
+  if(!next) return;
+  prefetched++;
+  const idle = typeof requestIdleCallback === 'function'
+    ? requestIdleCallback : f => setTimeout(f, 200);
+  idle(() => fetchCell(next).then(prefetchCells, () => {{}}));
+}}
+
+// Least recently used cells beyond MAX_CELLS (prefetched or shown) go
+// back to their URL and are fetched again on demand.
+function evictCells(keep){{
+  const shown = activeCellName &&
+    ((ALL_CELLS[activeCellName] || {{}}).alias || activeCellName);
+  for(let i = 0; liveCells.length > MAX_CELLS && i < liveCells.length; ){{
+    const n = liveCells[i];
+    if(n === keep || n === shown){{ i++; continue; }}
+    liveCells.splice(i, 1);
+    if(ALL_CELLS[n].sent) post({{type:'drop', name:n}});
+    ALL_CELLS[n] = CELL_URLS[n];
+  }}
+}}
+
+async function loadCell(name){{
+  // A cell drawn exactly like another one shares that cell's data.
+  const src = (ALL_CELLS[name] && ALL_CELLS[name].alias) || name;
+  let cd = ALL_CELLS[src];
+  if(typeof cd === 'string'){{
+    wantCell = name;
+    document.getElementById('cellName').textContent = name + ' \u2014 loading\u2026';
+    try{{ cd = await fetchCell(src); }}
+    catch(e){{
+      if(wantCell === name)
+        document.getElementById('cellName').textContent = name + ' \u2014 failed to load: ' + e.message;
+      return;
+    }}
+    if(wantCell !== name) return;   // another cell was picked meanwhile
+  }}
+  wantCell = name;
+  if(!cd || cd.lazy) return;
+  activeCellName = name;
+  if(!cd.sent){{
+    // Decoded once per cell, handed to the renderer without copying;
+    // this side keeps only the layer styles for the panel.
+    const transfer = [];
+    const Q = cd.q[1] === 16 ? Int16Array : Int32Array;
+    const layers = cd.l.map(L => {{
+      const T = [L[0], L[1], L[2], L[3], L[4],
+                 unpool(L[5], Q), unb64(L[6], Uint32Array), unb64(L[7], Float32Array),
+                 L[8].map(([eps, c, o]) => [eps, unb64(c, Q), unb64(o, Uint32Array)]),
+                 unb64(L[9], Uint32Array),
+                 [...L[10].slice(0, 5), ...L[10].slice(5).map(g => unb64(g, Uint32Array))]];
+      transfer.push(T[5].buffer, T[6].buffer, T[7].buffer, T[9].buffer);
+      T[10].slice(5).forEach(a => transfer.push(a.buffer));
+      T[8].forEach(lod => transfer.push(lod[1].buffer, lod[2].buffer));
+      return T;
+    }});
+    post({{type:'cell', name:src, layers, quant:[cd.b[0], cd.b[1], cd.q[0]]}}, transfer);
+    cd.l = cd.l.map(L => L.slice(0, 5));
+    cd.sent = true;
+  }}
+  if(CELL_URLS[src]) liveCells = liveCells.filter(n => n !== src).concat(src);
+  evictCells(src);
+  LAYERS = cd.l;
+  [GX,GY,GW,GH] = cd.b;
+  post({{type:'show', name:src}});
+
+  buildLayerPanel(); paintTree();
+  document.getElementById('cellName').textContent = name;
+  fitView(); scheduleRender();
+}}
+
+// ── View ──────────────────────────────────────────────────────────────────
+function fitView(){{
+  const W=CW, H=CH;
+  sc = Math.min(W/GW, H/GH)*0.97;
+  tx = (W-GW*sc)/2 - GX*sc;
+  ty = (H-GH*sc)/2 - GY*sc;
+  iSc=sc; iTx=tx; iTy=ty;
+  updateZoom();
+}}
+function updateZoom(){{
+  document.getElementById('zoomLbl').textContent = Math.round(sc/iSc*100)+'%';
+}}
+function updateRuler(){{
+  const gpx=1/sc, gl=niceNum(gpx*120), bp=gl*sc;
+  document.getElementById('rbar').style.width=bp+'px';
+  document.getElementById('rlabel').textContent=
+    (gl%1===0?gl:gl.toPrecision(3))+' '+UNIT;
 }}
 
 // ── Init ──────────────────────────────────────────────────────────────────
 function init(){{
   if(!wrap.offsetWidth){{ requestAnimationFrame(init); return; }}
-  resizeCanvas();
+  CW = wrap.offsetWidth  || 800;
+  CH = wrap.offsetHeight || 580;
+  post = startRenderer();
   buildCellTree();
   loadCell(INIT_CELL);
+  prefetchCells();
 }}
 requestAnimationFrame(init);
 
@@ -897,11 +2131,11 @@ window.addEventListener('mouseup',e=>{{
     }}
 
     let nx0=Math.min(bx0,cx), ny0=Math.min(by0,cy);
-    const cAR=cv.width/cv.height, sAR=nw/nh;
+    const cAR=CW/CH, sAR=nw/nh;
     if(sAR>cAR){{const n=nw/cAR;ny0-=(n-nh)/2;nh=n;}}
     else       {{const n=nh*cAR;nx0-=(n-nw)/2;nw=n;}}
     const wx0=(nx0-tx)/sc, wy0=(ny0-ty)/sc;
-    sc=sc*cv.width/nw; tx=-wx0*sc; ty=-wy0*sc;
+    sc=sc*CW/nw; tx=-wx0*sc; ty=-wy0*sc;
     updateZoom(); scheduleRender();
   }}
   dragBtn=-1;
@@ -923,14 +2157,9 @@ wrap.addEventListener('dblclick',()=>{{sc=iSc;tx=iTx;ty=iTy;updateZoom();schedul
 wrap.addEventListener('auxclick',e=>e.preventDefault());   // suppress middle-click auto-scroll
 </script></body></html>"""
 
-                components.html(html, height=700)
-                st.caption(
-                    "Scroll to zoom \u00b7 Middle-click drag to pan \u00b7 "
-                    "Box zoom: drag \u2198 to zoom in, drag \u2196 to zoom out \u00b7 "
-                    "Double-click to fit")
+        components.html(html, height=700)
+        st.caption(
+            "Scroll to zoom \u00b7 Middle-click drag to pan \u00b7 "
+            "Box zoom: drag \u2198 to zoom in, drag \u2196 to zoom out \u00b7 "
+            "Double-click to fit")
 
-        except Exception as e:
-            st.error(f"Viewer Error: {e}")
-        finally:
-            if os.path.exists(gds_path):
-                os.remove(gds_path)
@@ -1,4 +1,5 @@
 import os
+import queue
 import klayout.db as db
 import klayout.lay as lay
 
@@ -6,18 +7,32 @@ import klayout.lay as lay
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 LYP_PATH = os.path.join(CURRENT_DIR, "EBeam.lyp")
 
+# Views are reused across snapshots; a pooled view holds no layout.
+_VIEW_POOL = queue.LifoQueue(maxsize=4)
+
 def get_klayout_snapshot(gds_path, width=1200, height=800):
     ly = db.Layout()
     ly.read(gds_path)
     
-    view = lay.LayoutView()
-    view.show_layout(ly, False)
-    
-    # Load the professional layer properties!
-    if os.path.exists(LYP_PATH):
-        view.load_layer_props(LYP_PATH)
-    
-    view.zoom_fit()
-    img_path = gds_path.replace(".gds", "_preview.png")
-    view.save_image(img_path, width, height)
+    try:
+        view = _VIEW_POOL.get_nowait()
+    except queue.Empty:
+        view = lay.LayoutView()
+    try:
+        view.show_layout(ly, False)
+        
+        # Load the professional layer properties! (show_layout resets them)
+        if os.path.exists(LYP_PATH):
+            view.load_layer_props(LYP_PATH)
+        
+        view.zoom_fit()
+        img_path = gds_path.replace(".gds", "_preview.png")
+        view.save_image(img_path, width, height)
+    finally:
+        for i in reversed(range(view.cellviews())):
+            view.erase_cellview(i)
+        try:
+            _VIEW_POOL.put_nowait(view)
+        except queue.Full:
+            pass
     return img_path
\ No newline at end of file
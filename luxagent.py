@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import torch
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_ollama import OllamaLLM
@@ -9,7 +10,11 @@ from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
 # --- 1. Load the "Memory" (ChromaDB) ---
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+embeddings = HuggingFaceEmbeddings(
+    model_name="all-MiniLM-L6-v2",
+    model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+)
+embeddings.embed_query("warmup")  # load the model now, not on the first question
 vectorstore = Chroma(
     persist_directory="data/vector_db", 
     embedding_function=embeddings,
@@ -39,13 +44,29 @@ prompt = ChatPromptTemplate.from_template(template)
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
+answer_chain = prompt | llm | StrOutputParser()
 rag_chain = (
     {"context": retriever | format_docs, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
+    | answer_chain
 )
 
+def answer_many(questions, max_concurrency=8):
+    """Answer a list of questions, e.g. from a script.
+
+    The questions are embedded in one batched forward pass instead of one
+    per query; each then retrieves its own context and the LLM calls run
+    concurrently.
+    """
+    vectors = embeddings.embed_documents(questions)
+    contexts = [
+        format_docs(vectorstore.similarity_search_by_vector(v, **retriever.search_kwargs))
+        for v in vectors
+    ]
+    return answer_chain.batch(
+        [{"context": c, "question": q} for c, q in zip(contexts, questions)],
+        config={"max_concurrency": max_concurrency},
+    )
+
 # --- 5. Interactive Chat ---
 if __name__ == "__main__":
     print("🚀 LuxAgent Online. Ask about Silicon Photonics or CPO (type 'exit' to quit).")
@@ -54,5 +75,7 @@ if __name__ == "__main__":
         if query.lower() == "exit": break
         
         print("\nLuxAgent is analyzing papers...")
-        response = rag_chain.invoke(query)
-        print(f"\nLuxAgent: {response}")
\ No newline at end of file
+        print("\nLuxAgent: ", end="", flush=True)
+        for chunk in rag_chain.stream(query):
+            print(chunk, end="", flush=True)
+        print()
\ No newline at end of file
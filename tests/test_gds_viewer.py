@@ -0,0 +1,174 @@
+import base64
+import io
+import warnings
+
+import gdstk
+import numpy as np
+import pytest
+
+from gdsengine import gds_viewer
+
+
+def _decode(b64, dtype):
+    return np.frombuffer(base64.b64decode(b64), dtype=dtype)
+
+
+def test_large_extent_cell_keeps_its_vertices():
+    # A 25 mm die in nm: too big for int32 at the default 0.01 quantum.
+    cell = gdstk.Cell("DIE")
+    cell.add(gdstk.rectangle((0, 0), (1000, 500)))
+    cell.add(gdstk.rectangle((24_999_000, 24_999_000), (25_000_000, 25_000_000)))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        layers, vb_x, vb_y, vb_w, vb_h = gds_viewer._build_cell_data(cell)
+
+    quant = gds_viewer._quantum(vb_w, vb_h)
+    assert quant > gds_viewer._QUANTUM
+    coords = _decode(layers[0][5], gds_viewer._coord_dtype(vb_w, vb_h))
+    assert coords.min() >= 0
+    world = coords.reshape(-1, 2) * quant + (vb_x, vb_y)
+
+    want = np.concatenate([p.points for p in cell.polygons]) * (1, -1)
+    assert sorted(map(tuple, np.round(world))) == sorted(map(tuple, want))
+
+
+def test_flat_polygon_count_matches_flattening():
+    leaf = gdstk.Cell("LEAF")
+    leaf.add(gdstk.rectangle((0, 0), (1, 1)), gdstk.regular_polygon((3, 0), 1, 6))
+    mid = gdstk.Cell("MID")
+    mid.add(gdstk.Reference(leaf, columns=3, rows=2, spacing=(5, 5)))
+    mid.add(gdstk.FlexPath([(0, 0), (10, 0)], 0.5))
+    top = gdstk.Cell("TOP")
+    top.add(gdstk.Reference(mid), gdstk.Reference(mid, (100, 0), rotation=1.0),
+            gdstk.Reference(leaf))
+
+    memo = {}
+    for cell in (leaf, mid, top):
+        assert gds_viewer._flat_polygon_count(cell, memo) == len(cell.get_polygons())
+
+
+def test_lod_levels_only_empty_subpixel_polygons():
+    # Squares from 0.05 to 8 units in a 1000-unit cell.
+    cell = gdstk.Cell("ARRAY")
+    cell.add(gdstk.rectangle((0, 0), (1000, 1000), layer=1))
+    rng = np.random.default_rng(1)
+    for x, y, s in rng.uniform((0, 0, 0.05), (990, 990, 8), (2000, 3)):
+        cell.add(gdstk.rectangle((x, y), (x + s, y + s)))
+
+    layers = gds_viewer._build_cell_data(cell)[0]
+    emptied_any = False
+    for layer in layers:
+        b4   = _decode(layer[7], "<f4").reshape(-1, 4)
+        size = np.maximum(b4[:, 2] - b4[:, 0], b4[:, 3] - b4[:, 1])
+        for eps, _, offsets in layer[8]:
+            offsets = _decode(offsets, "<u4")
+            emptied = offsets[1:] == offsets[:-1]
+            emptied_any |= emptied.any()
+            # The renderer uses this level up to lod_px / eps pixels per unit.
+            for lod_px in gds_viewer._DETAIL_LEVELS.values():
+                assert (size[emptied] * lod_px / eps < 1).all()
+    assert emptied_any
+
+
+def test_parse_lyp_keeps_long_colors_and_last_nonempty_name():
+    lyp = io.BytesIO(b"""<layer-properties>
+      <properties><fill-color>#ff8080</fill-color><name>M1</name><source>1/0@1</source></properties>
+      <properties><fill-color>#80ff8080</fill-color><source>1/0@1</source></properties>
+      <properties><fill-color>#0000ff</fill-color><source>2/0@1</source></properties>
+    </layer-properties>""")
+
+    table = gds_viewer._parse_lyp(lyp)
+    assert table["layer"].tolist() == [1, 2]
+    assert table["fill"].tolist() == ["#80ff8080", "#0000ff"]
+    assert table["name"].tolist() == ["M1", ""]
+
+
+def test_pool_shapes_round_trips_translated_copies():
+    square = np.array([0, 0, 4, 0, 4, 4, 0, 4])
+    shifts = np.arange(50)[:, None] * (10, 3)
+    coords = np.concatenate([(square.reshape(-1, 2) + d).ravel() for d in shifts]
+                            + [np.array([0, 0, 5, 0, 0, 7])])
+    counts = np.array([4] * 50 + [3])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    pool, pool_off, sid, deltas = (
+        _decode(b, dt) for b, dt in zip(
+            gds_viewer._pool_shapes(coords, starts, counts, "<i4"),
+            ("<i4", "<u4", "<u4", "<i4")))
+    assert len(pool_off) == 3   # the square and the triangle
+    deltas = deltas.reshape(-1, 2)
+    rebuilt = np.concatenate([
+        (pool[pool_off[i]:pool_off[i + 1]].reshape(-1, 2) + d).ravel()
+        for i, d in zip(sid, deltas)])
+    assert (rebuilt == coords).all()
+
+    distinct = np.arange(24)   # three unrelated quads: nothing to share
+    assert gds_viewer._pool_shapes(distinct, np.array([0, 4, 8]),
+                                   np.array([4, 4, 4]), "<i4") is None
+
+
+def test_grid_index_lists_every_polygon_once():
+    rng = np.random.default_rng(2)
+    lo = rng.uniform(0, 1000, (500, 2))
+    size = rng.uniform(0.1, 5, (500, 2))
+    size[:5] = 400   # a few polygons wider than any bin
+    bounds = np.hstack((lo, lo + size))
+
+    x0, y0, step, nx, ny, start, idx, big = gds_viewer._grid_index(bounds)
+    start, idx, big = (_decode(a, "<u4") for a in (start, idx, big))
+    assert len(start) == nx * ny + 1
+    assert sorted(idx.tolist() + big.tolist()) == list(range(len(bounds)))
+    assert set(range(5)) <= set(big.tolist())
+    for b in range(nx * ny):
+        cx = (bounds[idx[start[b]:start[b + 1]], 0] +
+              bounds[idx[start[b]:start[b + 1]], 2]) / 2
+        cy = (bounds[idx[start[b]:start[b + 1]], 1] +
+              bounds[idx[start[b]:start[b + 1]], 3]) / 2
+        assert (np.minimum((cx - x0) // step, nx - 1) == b % nx).all()
+        assert (np.minimum((cy - y0) // step, ny - 1) == b // nx).all()
+
+
+def test_cell_signature_follows_flattened_geometry():
+    def make(name, offset):
+        leaf = gdstk.Cell(name + "_LEAF")
+        leaf.add(gdstk.rectangle((0, 0), (1, 2)))
+        top = gdstk.Cell(name)
+        top.add(gdstk.Reference(leaf, (offset, 0), columns=2, rows=1, spacing=(3, 0)))
+        return top
+
+    memo = {}
+    a, b, moved = make("A", 0), make("B", 0), make("C", 1)
+    assert gds_viewer._cell_signature(a, memo) == gds_viewer._cell_signature(b, memo)
+    assert gds_viewer._cell_signature(a, memo) != gds_viewer._cell_signature(moved, memo)
+    assert {"A", "A_LEAF", "B", "B_LEAF", "C", "C_LEAF"} <= set(memo)
+
+
+def test_triangulate_covers_convex_and_concave_polygons():
+    pytest.importorskip("mapbox_earcut")
+    square = [0, 0, 2, 0, 2, 2, 0, 2]
+    ell    = [0, 0, 3, 0, 3, 1, 1, 1, 1, 3, 0, 3]   # concave: goes to earcut
+    coords  = np.array(square + ell, dtype=float)
+    offsets = np.array([0, 8, 20])
+
+    tris = gds_viewer._triangulate(coords, offsets).reshape(-1, 3)
+    verts = coords.reshape(-1, 2)
+    ab = verts[tris[:, 1]] - verts[tris[:, 0]]
+    ac = verts[tris[:, 2]] - verts[tris[:, 0]]
+    area = np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]).sum() / 2
+    assert area == 4 + 5
+    assert (tris[:2] < 4).all() and (tris[2:] >= 4).all()
+
+
+def test_disk_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(gds_viewer, "_DISK_CACHE_DIR", str(tmp_path))
+    payload = ({"TOP": b"\x1f\x8b gzip bytes", "SUB": {"lazy": True}},
+               '["TOP"]', '{"TOP": ["SUB"]}', "TOP", "nm", ["SUB"])
+
+    assert gds_viewer._disk_cache_get("k") is None
+    gds_viewer._disk_cache_put("k", payload)
+    assert gds_viewer._disk_cache_get("k") == payload
+
+    for path in tmp_path.iterdir():
+        path.write_bytes(b"not a cache entry")
+    assert gds_viewer._disk_cache_get("k") is None